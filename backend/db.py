@@ -1,31 +1,164 @@
 """
 SQLite database setup and models for BannkMint AI
 """
+import hashlib
+import os
 import sqlite3
-from typing import Optional, List, Dict, Any
+import queue
+from itertools import islice
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Tuple
 from pydantic import BaseModel
 from datetime import datetime
 import uuid
 
 # Database connection
 DATABASE_URL = "sqlite:///./transactions.db"
+DATABASE_PATH = "transactions.db"
 
-# Initialize database on import
-def init_database():
-    """Initialize the database with required tables"""
-    conn = sqlite3.connect("transactions.db")
-    cursor = conn.cursor()
+# Connection pool shared by all requests (FastAPI runs sync work in a threadpool)
+POOL_SIZE = 8
+_pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=POOL_SIZE)
+_write_lock = threading.Lock()
+
+# Schema is created lazily by the first connection borrowed, not at import
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+# Prepared statements kept per pooled connection, keyed by SQL text
+STATEMENT_CACHE_SIZE = 256
+
+# Rows handed to sqlite per executemany call in batch writes
+BATCH_CHUNK_SIZE = 1000
+
+# Rows fetched per round trip when streaming query results as tuples
+FETCH_CHUNK_SIZE = 10000
+
+# Per-connection tuning; journal_mode=WAL is persistent and set once with the schema
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Version of the transaction_hash scheme, kept in PRAGMA user_version; bump it
+# whenever transaction_hash() changes so stored hashes are recomputed once
+TRANSACTION_HASH_VERSION = 1
+
+# Transactions below this confidence (or uncategorized) need manual review.
+# Kept as a literal in SQL so queries can use the matching partial index.
+REVIEW_CONFIDENCE_THRESHOLD = 0.9
+NEEDS_REVIEW_PREDICATE = (
+    "category = 'Uncategorized' OR confidence IS NULL "
+    f"OR confidence < {REVIEW_CONFIDENCE_THRESHOLD}"
+)
+
+# Transactions are only ever inserted (new rowids) or recategorized (which
+# records a correction); balances live on accounts. Any write that changes
+# report or forecast inputs therefore changes this row.
+DATA_VERSION_QUERY = """
+    SELECT (SELECT MAX(rowid) FROM transactions) AS last_transaction,
+           (SELECT COUNT(*) FROM corrections) AS corrections,
+           (SELECT COUNT(*) FROM accounts) AS accounts,
+           (SELECT SUM(balance) FROM accounts) AS total_balance
+"""
+
+def _connect() -> sqlite3.Connection:
+    """Open a new pooled connection"""
+    conn = sqlite3.connect(
+        DATABASE_PATH, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+@contextmanager
+def get_connection() -> Iterator[sqlite3.Connection]:
+    """Borrow a connection from the pool, returning it when done"""
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        conn = _connect()
     
-    # Create accounts table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS accounts (
+    try:
+        if not _schema_ready:
+            _ensure_schema(conn)
+        yield conn
+    finally:
+        try:
+            _pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+@contextmanager
+def write_transaction() -> Iterator[sqlite3.Connection]:
+    """Borrow a connection and run one write transaction on it, holding the
+    write lock throughout; commits when the block exits, rolls back if it raises"""
+    with get_connection() as conn:
+        with _write_lock, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+
+# Small tables keyed by a TEXT id are stored clustered on the primary key.
+# transactions stays a rowid table since it is append-heavy.
+LOOKUP_TABLE_SCHEMAS = {
+    'accounts': '''(
             id TEXT PRIMARY KEY,
             name TEXT NOT NULL,
             account_type TEXT NOT NULL,
             balance REAL NOT NULL DEFAULT 0.0,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+        ) WITHOUT ROWID''',
+    'rules': '''(
+            id TEXT PRIMARY KEY,
+            description_pattern TEXT NOT NULL,
+            category TEXT NOT NULL,
+            confidence REAL NOT NULL DEFAULT 1.0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID''',
+    'corrections': '''(
+            id TEXT PRIMARY KEY,
+            transaction_id TEXT NOT NULL,
+            old_category TEXT NOT NULL,
+            new_category TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (transaction_id) REFERENCES transactions (id)
+        ) WITHOUT ROWID''',
+}
+
+def init_database():
+    """Initialize the database with required tables"""
+    with get_connection() as conn:
+        _ensure_schema(conn)
+
+def _ensure_schema(conn: sqlite3.Connection):
+    """Create the schema once per process, whichever thread gets there first"""
+    global _schema_ready
+    with _schema_lock:
+        if _schema_ready:
+            return
+        with _write_lock:
+            _create_schema(conn)
+        _schema_ready = True
+
+def _create_schema(conn: sqlite3.Connection):
+    """Create tables on the given connection"""
+    cursor = conn.cursor()
+    
+    # Write-ahead logging lets readers proceed while a write is in progress
+    cursor.execute("PRAGMA journal_mode=WAL")
+    schema_version = cursor.execute("PRAGMA schema_version").fetchone()[0]
+    
+    # Create accounts, rules and corrections tables
+    for table, definition in LOOKUP_TABLE_SCHEMAS.items():
+        _migrate_to_without_rowid(cursor, table, definition)
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} {definition}")
     
     # Create transactions table
     cursor.execute('''
@@ -40,35 +173,154 @@ def init_database():
             explanation TEXT,
             original_csv_row INTEGER,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            transaction_hash INTEGER,
             FOREIGN KEY (account_id) REFERENCES accounts (id)
         )
     ''')
+    _add_missing_column(cursor, 'transactions', 'transaction_hash', 'INTEGER')
     
-    # Create rules table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS rules (
-            id TEXT PRIMARY KEY,
-            description_pattern TEXT NOT NULL,
-            category TEXT NOT NULL,
-            confidence REAL NOT NULL DEFAULT 1.0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    # Foreign-key and lookup indexes; the account index also carries the
+    # duplicate-detection hash and enforces one row per hash and account
+    cursor.execute("DROP INDEX IF EXISTS ix_tx_account")
+    _migrate_to_unique_transaction_hash(cursor)
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_tx_account_hash ON transactions (account_id, transaction_hash)")
+    _migrate_transaction_hashes(cursor)
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_tx_category_confidence ON transactions (category, confidence)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_corrections_transaction ON corrections (transaction_id)")
+    _merge_duplicate_accounts(cursor)
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_accounts_name ON accounts (name)")
     
-    # Create corrections table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS corrections (
-            id TEXT PRIMARY KEY,
-            transaction_id TEXT NOT NULL,
-            old_category TEXT NOT NULL,
-            new_category TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (transaction_id) REFERENCES transactions (id)
-        )
+    # Date-range scans (reports, forecasts, dashboard) read only these
+    # columns, so they are served from the index pages alone; it also
+    # replaces the plain date index for ORDER BY date
+    cursor.execute("DROP INDEX IF EXISTS ix_tx_date")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_tx_date_totals ON transactions (date, category, amount, confidence)")
+    
+    # Partial index covering the reconciliation "needs review" predicate
+    cursor.execute(f'''
+        CREATE INDEX IF NOT EXISTS ix_tx_needs_review ON transactions (date DESC)
+        WHERE {NEEDS_REVIEW_PREDICATE}
     ''')
     
+    # Refresh planner statistics in full only when a table or index was
+    # created or migrated above; otherwise let SQLite decide what is stale
+    if cursor.execute("PRAGMA schema_version").fetchone()[0] != schema_version:
+        cursor.execute("ANALYZE")
+    else:
+        cursor.execute("PRAGMA optimize")
+    
     conn.commit()
-    conn.close()
+
+def _add_missing_column(cursor: sqlite3.Cursor, table: str, column: str, column_type: str):
+    """Add a column to a table created before the column was declared"""
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+def _migrate_to_unique_transaction_hash(cursor: sqlite3.Cursor):
+    """Replace the non-unique hash index, clearing hashes of duplicate rows first"""
+    existing = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ix_tx_account_hash'"
+    ).fetchone()
+    if existing is None:
+        return
+    
+    # Rows sharing a hash keep it only on the earliest copy
+    cursor.execute("""
+        UPDATE transactions SET transaction_hash = NULL
+        WHERE transaction_hash IS NOT NULL AND rowid NOT IN (
+            SELECT MIN(rowid) FROM transactions
+            WHERE transaction_hash IS NOT NULL
+            GROUP BY account_id, transaction_hash
+        )
+    """)
+    cursor.execute("DROP INDEX ix_tx_account_hash")
+
+def _migrate_transaction_hashes(cursor: sqlite3.Cursor):
+    """Recompute every stored hash when the hash scheme is newer than the database's"""
+    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+    if version >= TRANSACTION_HASH_VERSION:
+        return
+    
+    # Rows are rehashed in rowid order, so among copies of the same
+    # transaction only the earliest gets the hash under the unique index
+    cursor.connection.create_function("transaction_hash", 3, transaction_hash, deterministic=True)
+    cursor.execute("UPDATE transactions SET transaction_hash = NULL")
+    cursor.execute("""
+        UPDATE OR IGNORE transactions
+        SET transaction_hash = transaction_hash(substr(date, 1, 10), description, amount)
+    """)
+    cursor.execute(f"PRAGMA user_version = {TRANSACTION_HASH_VERSION}")
+
+def _merge_duplicate_accounts(cursor: sqlite3.Cursor):
+    """Fold accounts sharing a name into the earliest one before the name becomes unique"""
+    existing = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ux_accounts_name'"
+    ).fetchone()
+    if existing is not None:
+        return
+    
+    cursor.execute("""
+        CREATE TEMP TABLE account_merges AS
+        SELECT id AS old_id, keep_id FROM (
+            SELECT id, FIRST_VALUE(id) OVER (
+                PARTITION BY name ORDER BY created_at, id
+            ) AS keep_id
+            FROM accounts
+        )
+        WHERE id != keep_id
+    """)
+    
+    # A moved row whose hash the surviving account (or an earlier moved
+    # row) already has loses it, so the hash index stays unique
+    cursor.execute("""
+        UPDATE transactions SET transaction_hash = NULL
+        WHERE rowid IN (
+            SELECT t.rowid FROM transactions t
+            JOIN account_merges m ON m.old_id = t.account_id
+            WHERE t.transaction_hash IS NOT NULL AND (
+                EXISTS (
+                    SELECT 1 FROM transactions k
+                    WHERE k.account_id = m.keep_id AND k.transaction_hash = t.transaction_hash
+                )
+                OR EXISTS (
+                    SELECT 1 FROM transactions o
+                    JOIN account_merges om ON om.old_id = o.account_id
+                    WHERE om.keep_id = m.keep_id AND o.transaction_hash = t.transaction_hash
+                      AND o.rowid < t.rowid
+                )
+            )
+        )
+    """)
+    cursor.execute("""
+        UPDATE transactions
+        SET account_id = (SELECT keep_id FROM account_merges WHERE old_id = transactions.account_id)
+        WHERE account_id IN (SELECT old_id FROM account_merges)
+    """)
+    cursor.execute("""
+        UPDATE accounts
+        SET balance = balance + (
+            SELECT TOTAL(a.balance) FROM accounts a
+            JOIN account_merges m ON m.old_id = a.id
+            WHERE m.keep_id = accounts.id
+        )
+        WHERE id IN (SELECT keep_id FROM account_merges)
+    """)
+    cursor.execute("DELETE FROM accounts WHERE id IN (SELECT old_id FROM account_merges)")
+    cursor.execute("DROP TABLE account_merges")
+
+def _migrate_to_without_rowid(cursor: sqlite3.Cursor, table: str, definition: str):
+    """Rebuild a table that was created before it was declared WITHOUT ROWID"""
+    existing = cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()
+    if existing is None or 'WITHOUT ROWID' in existing[0].upper():
+        return
+    
+    cursor.execute(f"CREATE TABLE {table}_migrated {definition}")
+    cursor.execute(f"INSERT INTO {table}_migrated SELECT * FROM {table}")
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {table}_migrated RENAME TO {table}")
 
 # Compatibility functions for server.py
 def create_tables():
@@ -79,10 +331,6 @@ def init_default_data():
     """Initialize default data - compatibility function"""
     pass
 
-def get_db():
-    """Mock database session for compatibility - not used with SQLite approach"""
-    return None
-
 # Pydantic models for API responses
 class Account(BaseModel):
     id: str
@@ -118,46 +366,108 @@ class Correction(BaseModel):
     created_at: datetime
 
 # Raw database operations using sqlite3 directly
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _is_select(query: str) -> bool:
+    """Classify a statement once per distinct SQL text"""
+    return query.strip().lower().startswith('select')
+
 def execute_query(query: str, params: tuple = ()) -> List[Dict[Any, Any]]:
     """Execute a query and return results as list of dictionaries"""
-    conn = sqlite3.connect("transactions.db")
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    try:
+    with get_connection() as conn:
+        if _is_select(query):
+            cursor = conn.execute(query, params)
+            return [dict(row) for row in cursor.fetchall()]
+        
+        # Writes are serialized; the connection context commits or rolls back
+        with _write_lock, conn:
+            conn.execute(query, params)
+        return []
+
+def execute_query_rows(query: str, params: tuple = ()) -> Iterator[tuple]:
+    """Execute a read query and yield plain row tuples in fetched batches,
+    skipping per-row dict construction; the connection is held until exhausted"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
         cursor.execute(query, params)
-        if query.strip().lower().startswith('select'):
-            results = [dict(row) for row in cursor.fetchall()]
-        else:
-            conn.commit()
-            results = []
-        return results
-    finally:
-        conn.close()
+        while True:
+            rows = cursor.fetchmany(FETCH_CHUNK_SIZE)
+            if not rows:
+                break
+            yield from rows
+
+def execute_many(
+    query: str, 
+    seq_of_params: Iterable[tuple], 
+    conn: Optional[sqlite3.Connection] = None
+) -> int:
+    """Execute a write statement for each parameter tuple in a single transaction,
+    returning the number of rows changed. Given the connection of an open
+    write_transaction, the rows join that transaction instead"""
+    if conn is not None:
+        return _execute_batches(conn, query, seq_of_params)
+    
+    with get_connection() as conn:
+        with _write_lock, conn:
+            return _execute_batches(conn, query, seq_of_params)
+
+def _execute_batches(conn: sqlite3.Connection, query: str, seq_of_params: Iterable[tuple]) -> int:
+    """Run executemany over BATCH_CHUNK_SIZE parameter tuples at a time"""
+    params_iter = iter(seq_of_params)
+    row_count = 0
+    while True:
+        chunk = list(islice(params_iter, BATCH_CHUNK_SIZE))
+        if not chunk:
+            break
+        # Rows skipped by ON CONFLICT / OR IGNORE don't count
+        row_count += conn.executemany(query, chunk).rowcount
+    return row_count
 
 # Helper functions
+_last_id_value = 0
+_id_lock = threading.Lock()
+
 def generate_id() -> str:
-    """Generate a unique UUID string"""
-    return str(uuid.uuid4())
+    """Generate a unique, time-ordered UUID (version 7 layout) string"""
+    # Millisecond timestamp in the high bits keeps primary key inserts
+    # appending to the right edge of the b-tree instead of random pages
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), 'big')
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    
+    # Ids minted within the same millisecond still sort in creation order
+    global _last_id_value
+    with _id_lock:
+        if value <= _last_id_value:
+            value = _last_id_value + 1
+        _last_id_value = value
+    return str(uuid.UUID(int=value))
+
+def transaction_hash(day: str, description: str, amount: float) -> int:
+    """Signed 64-bit BLAKE2b digest of a transaction's day, description and
+    amount, the stored duplicate-detection key"""
+    # The amount goes in as a float repr (with -0.0 folded into 0.0) so
+    # integer amounts and stored REAL values give the same key
+    key = f"{day}|{description}|{float(amount) + 0.0!r}"
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+def data_version() -> Tuple:
+    """Cheap stamp that changes whenever transactions, corrections or
+    account balances are written, for keying cached results"""
+    return tuple(execute_query(DATA_VERSION_QUERY)[0].values())
 
 def get_or_create_account(name: str, account_type: str = "checking") -> str:
     """Get existing account or create new one"""
-    # Check if account exists
-    existing_accounts = execute_query(
-        "SELECT id FROM accounts WHERE name = ?", (name,)
-    )
-    
-    if existing_accounts:
-        return existing_accounts[0]['id']
+    # Single upsert on the unique name index; the no-op update makes RETURNING
+    # yield the existing row's id on conflict
+    with get_connection() as conn:
+        with _write_lock, conn:
+            row = conn.execute(
+                """INSERT INTO accounts (id, name, account_type, balance) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(name) DO UPDATE SET name = excluded.name
+                   RETURNING id""",
+                (generate_id(), name, account_type, 0.0)
+            ).fetchone()
     
-    # Create new account
-    account_id = generate_id()
-    execute_query(
-        "INSERT INTO accounts (id, name, account_type, balance) VALUES (?, ?, ?, ?)",
-        (account_id, name, account_type, 0.0)
-    )
-    
-    return account_id
-
-# Initialize database when module is imported
-init_database()
\ No newline at end of file
+    return row['id']
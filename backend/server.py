@@ -1,15 +1,222 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 import pandas as pd
+import numpy as np
+import asyncio
+import re
 import sqlite3
+import threading
 import uuid
-from io import StringIO
+from tempfile import SpooledTemporaryFile
 import os
 
-app = FastAPI()
+# orjson serializes the transaction and projection lists straight to bytes
+app = FastAPI(default_response_class=ORJSONResponse)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
 DB_PATH = '/app/data/simple.db'
+GZIP_MAGIC = b'\x1f\x8b'
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+UPLOAD_SPOOL_BYTES = 4 * 1024 * 1024
+CSV_CHUNK_ROWS = 10_000
+INSERT_CHUNK_ROWS = 500
+
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+# Keyword alternations per category, checked in priority order
+CATEGORY_PATTERNS = {
+    "Restaurant Operations": re.compile('restaurant|square|food|sysco|supplier'),
+    "Payroll & Benefits": re.compile('payroll|processing'),
+    "Rent & Utilities": re.compile('rent|utilities|gas'),
+}
+DEFAULT_CATEGORY = "Business Expense"
+CATEGORY_IDS = {name: i for i, name in enumerate([*CATEGORY_PATTERNS, DEFAULT_CATEGORY], start=1)}
+
+async def read_upload(file: UploadFile) -> SpooledTemporaryFile:
+    """Copy an upload into a spooled file in chunks, enforcing the size limit"""
+    spool = SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+    size = 0
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            spool.close()
+            raise HTTPException(status_code=413, detail="File too large (max 20MB)")
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+# Long-lived connections so PRAGMAs and the page cache survive across requests:
+# one for the read endpoints and one for imports, which run one at a time
+_read_conn = None
+_write_conn = None
+_write_lock = threading.Lock()
+
+def connect() -> sqlite3.Connection:
+    """Open the transactions database with write-ahead logging"""
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def read_connection():
+    """Shared connection for the read endpoints, or None before the first import"""
+    global _read_conn
+    if _read_conn is None:
+        if not os.path.exists(DB_PATH):
+            return None
+        upgrade_legacy_schema()
+        _read_conn = connect()
+    return _read_conn
+
+def write_connection() -> sqlite3.Connection:
+    """Shared connection for imports; callers hold _write_lock"""
+    global _write_conn
+    if _write_conn is None:
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+        _write_conn = connect()
+    return _write_conn
+
+def create_schema(conn: sqlite3.Connection):
+    """Create the category lookup table and an empty transactions table"""
+    # Category names live once in a lookup table; rows store its integer id
+    conn.execute('CREATE TABLE categories (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)')
+    conn.executemany('INSERT INTO categories VALUES (?, ?)', [(i, name) for name, i in CATEGORY_IDS.items()])
+    conn.execute('CREATE TABLE transactions (id TEXT PRIMARY KEY, description TEXT, amount REAL, category_id INTEGER REFERENCES categories (id))')
+    conn.execute('CREATE INDEX idx_tx_category ON transactions (category_id)')
+
+def upgrade_legacy_schema():
+    """Move a database written before the categories table existed onto it"""
+    with _write_lock:
+        conn = write_connection()
+        tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if 'transactions' not in tables or 'categories' in tables:
+            return
+        try:
+            _migrate_legacy_transactions(conn)
+        except Exception:
+            conn.rollback()
+            raise
+
+def _migrate_legacy_transactions(conn: sqlite3.Connection):
+    """Rewrite (id, description, amount, category) rows to category ids in one transaction"""
+    conn.execute('BEGIN IMMEDIATE')
+    conn.execute('ALTER TABLE transactions RENAME TO legacy_transactions')
+    create_schema(conn)
+    
+    # Names outside the current keyword groups get lookup rows of their own
+    conn.execute("""
+        INSERT OR IGNORE INTO categories (name)
+        SELECT DISTINCT COALESCE(category, ?) FROM legacy_transactions
+    """, (DEFAULT_CATEGORY,))
+    conn.execute("""
+        INSERT OR IGNORE INTO transactions
+        SELECT t.id, t.description, t.amount, c.id
+        FROM legacy_transactions t JOIN categories c ON c.name = COALESCE(t.category, ?)
+        ORDER BY t.rowid
+    """, (DEFAULT_CATEGORY,))
+    conn.execute('DROP TABLE legacy_transactions')
+    conn.commit()
+
+def new_ids(count: int) -> list:
+    """Random version 4 UUID strings drawn from a single urandom call"""
+    raw = os.urandom(16 * count)
+    return [str(uuid.UUID(bytes=raw[i:i + 16], version=4)) for i in range(0, 16 * count, 16)]
+
+def column_or_default(df: pd.DataFrame, names: list, default) -> pd.Series:
+    """Return the first of the given columns present in the frame, else a constant column"""
+    for name in names:
+        if name in df.columns:
+            return df[name]
+    return pd.Series(default, index=df.index)
+
+def transaction_rows(df: pd.DataFrame) -> list:
+    """Turn a parsed CSV frame into (id, description, amount, category_id) rows"""
+    # Handle different possible column names
+    descriptions = column_or_default(df, ['Description', 'description', 'DESCRIPTION'], '').astype(str)
+    
+    # Get amount from different possible column names and handle the format properly
+    amount_strs = (
+        column_or_default(df, ['Amount', 'amount', 'AMOUNT'], 0).astype(str)
+        .str.replace('$', '', regex=False)
+        .str.replace(',', '', regex=False)
+        .str.replace('"', '', regex=False)
+        .str.strip()
+    )
+    
+    # Handle negative amounts (credits are negative, debits are positive in restaurant context)
+    transaction_types = column_or_default(df, ['Type', 'type'], '').astype(str).str.lower()
+    negative = amount_strs.str.startswith('-') | amount_strs.str.contains('(', regex=False)
+    unsigned = amount_strs.where(~negative, amount_strs.str.replace(r'[()\-]', '', regex=True))
+    amounts = pd.to_numeric(unsigned, errors='coerce').astype(float)
+    # Leave whatever the fast parser rejected (nan, inf, bad values) to float() so
+    # the accepted spellings and the error for unparseable amounts stay the same
+    unparsed = amounts.isna()
+    if unparsed.any():
+        amounts[unparsed] = unsigned[unparsed].map(float)
+    # If it's a Credit type, make it negative (money going out)
+    is_credit = transaction_types.str.contains('credit', regex=False)
+    amounts = np.where(negative | is_credit, -amounts.abs(), amounts)
+    
+    # Better categorization based on description: first matching keyword group wins
+    desc_lower = descriptions.str.lower()
+    category_ids = np.select(
+        [desc_lower.str.contains(pattern, regex=True) for pattern in CATEGORY_PATTERNS.values()],
+        [CATEGORY_IDS[name] for name in CATEGORY_PATTERNS],
+        default=CATEGORY_IDS[DEFAULT_CATEGORY]
+    )
+    
+    return list(zip(new_ids(len(df)), descriptions, amounts.tolist(), category_ids.tolist()))
+
+def insert_transactions(conn: sqlite3.Connection, rows: list):
+    """Insert rows using multi-row VALUES statements of up to INSERT_CHUNK_ROWS rows"""
+    for start in range(0, len(rows), INSERT_CHUNK_ROWS):
+        batch = rows[start:start + INSERT_CHUNK_ROWS]
+        placeholders = ', '.join(['(?, ?, ?, ?)'] * len(batch))
+        conn.execute(
+            f"INSERT INTO transactions VALUES {placeholders}",
+            [value for row in batch for value in row]
+        )
+
+def import_csv(upload: SpooledTemporaryFile) -> int:
+    """Replace the transactions database with the rows of an uploaded CSV"""
+    with _write_lock:
+        conn = write_connection()
+        try:
+            return _replace_transactions(conn, upload)
+        except Exception:
+            conn.rollback()
+            raise
+
+def _replace_transactions(conn: sqlite3.Connection, upload: SpooledTemporaryFile) -> int:
+    """Recreate the tables and load the upload into them on the given connection"""
+    # Clear database; tables are dropped rather than the file removed so the
+    # shared connections stay valid
+    conn.execute('DROP TABLE IF EXISTS transactions')
+    conn.execute('DROP TABLE IF EXISTS categories')
+    create_schema(conn)
+    conn.commit()
+    
+    # Parse and insert in fixed-size chunks so memory stays flat for large
+    # files; everything is committed once at the end. Reading every column
+    # as text keeps parsing independent of how rows fall into chunks.
+    imported = 0
+    with upload:
+        # Gzipped uploads are detected by magic bytes and decompressed while parsing
+        compression = 'gzip' if upload.read(2) == GZIP_MAGIC else None
+        upload.seek(0)
+        for chunk in pd.read_csv(upload, compression=compression, dtype=str, chunksize=CSV_CHUNK_ROWS):
+            insert_transactions(conn, transaction_rows(chunk))
+            imported += len(chunk)
+    
+    conn.commit()
+    return imported
 
 @app.get("/api/health")
 async def health():
@@ -18,89 +225,54 @@ async def health():
 @app.post("/api/ingest")
 async def upload_csv(file: UploadFile = File(...)):
     try:
-        # Clear database
-        os.makedirs('/app/data', exist_ok=True)
-        if os.path.exists(DB_PATH):
-            os.remove(DB_PATH)
-        
-        # Read CSV
-        content = await file.read()
-        df = pd.read_csv(StringIO(content.decode('utf-8')))
-        
-        # Save to database
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('CREATE TABLE transactions (id TEXT, description TEXT, amount REAL, category TEXT)')
-        
-        for _, row in df.iterrows():
-            # Handle different possible column names
-            description = str(row.get('Description', row.get('description', row.get('DESCRIPTION', ''))))
-            
-            # Get amount from different possible column names and handle the format properly
-            amount_value = row.get('Amount', row.get('amount', row.get('AMOUNT', 0)))
-            amount_str = str(amount_value).replace('$', '').replace(',', '').replace('"', '').strip()
-            
-            # Handle negative amounts (credits are negative, debits are positive in restaurant context)
-            transaction_type = str(row.get('Type', row.get('type', ''))).lower()
-            if amount_str.startswith('-') or '(' in amount_str:
-                amount = -abs(float(amount_str.replace('(', '').replace(')', '').replace('-', '')))
-            else:
-                amount = float(amount_str)
-                # If it's a Credit type, make it negative (money going out)
-                if 'credit' in transaction_type:
-                    amount = -abs(amount)
-            
-            # Better categorization based on description
-            desc_lower = description.lower()
-            if any(w in desc_lower for w in ['restaurant', 'square', 'food', 'sysco', 'supplier']):
-                category = "Restaurant Operations"
-            elif any(w in desc_lower for w in ['payroll', 'processing']):
-                category = "Payroll & Benefits"
-            elif any(w in desc_lower for w in ['rent', 'utilities', 'gas']):
-                category = "Rent & Utilities"
-            else:
-                category = "Business Expense"
-                
-            cursor.execute("INSERT INTO transactions VALUES (?, ?, ?, ?)", 
-                         (str(uuid.uuid4()), description, amount, category))
+        # Read CSV, rejecting oversized uploads before they are fully buffered
+        upload = await read_upload(file)
         
-        conn.commit()
-        conn.close()
-        return {"success": True, "imported": len(df)}
+        # Parsing and inserting are blocking, so keep them off the event loop
+        imported = await asyncio.to_thread(import_csv, upload)
+        return {"success": True, "imported": imported}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/reconcile/inbox")
 async def get_transactions():
-    if not os.path.exists(DB_PATH):
+    conn = read_connection()
+    if conn is None:
         return {"transactions": []}
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM transactions")
-    rows = cursor.fetchall()
-    conn.close()
+    # Build the response straight from the cursor without an intermediate row list
+    cursor = conn.execute("""
+        SELECT t.id, t.description, t.amount, c.name
+        FROM transactions t JOIN categories c ON c.id = t.category_id
+        ORDER BY t.rowid
+    """)
+    transactions = [
+        {"id": tx_id, "posted_at": "2024-01-01", "description": description, "amount": amount, "category": category, "confidence": 0.9, "why": "Auto-categorized"}
+        for tx_id, description, amount, category in cursor
+    ]
     
-    transactions = [{"id": r[0], "posted_at": "2024-01-01", "description": r[1], "amount": r[2], "category": r[3], "confidence": 0.9, "why": "Auto-categorized"} for r in rows]
-    return {"transactions": transactions, "total": len(transactions)}
+    return ORJSONResponse({"transactions": transactions, "total": len(transactions)})
 
 @app.get("/api/forecast")
 async def get_forecast():
-    if not os.path.exists(DB_PATH):
+    conn = read_connection()
+    if conn is None:
         return {"current_cash": 0.0, "business_metrics": {}, "daily_projections": []}
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT amount FROM transactions")
-    amounts = [row[0] for row in cursor.fetchall()]
-    conn.close()
+    # Aggregate in SQLite rather than pulling every amount into Python
+    row_count, total_inflow, total_outflow = conn.execute("""
+        SELECT COUNT(*),
+               COALESCE(SUM(CASE WHEN amount > 0 THEN amount END), 0),
+               COALESCE(SUM(CASE WHEN amount < 0 THEN -amount END), 0)
+        FROM transactions
+    """).fetchone()
     
-    if not amounts:
+    if not row_count:
         return {"current_cash": 0.0, "business_metrics": {}, "daily_projections": []}
     
-    total_inflow = sum(a for a in amounts if a > 0)
-    total_outflow = sum(abs(a) for a in amounts if a < 0)
     current_cash = total_inflow - total_outflow
     net_weekly = (total_inflow - total_outflow) / 4
     
@@ -3,8 +3,10 @@ Banking Integration Foundation for BannkMint AI SMB Banking OS
 Phase 3A: Bank Connection Simulation & Executive Dashboard
 """
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
+import asyncio
+import heapq
 import random
 from db import execute_query, get_or_create_account, generate_id
 
@@ -18,7 +20,7 @@ class BankingService:
             "TD Bank", "Regions Bank", "Fifth Third Bank"
         ]
     
-    def simulate_bank_connection(self, bank_name: str, credentials: Dict[str, str]) -> Dict[str, Any]:
+    async def simulate_bank_connection(self, bank_name: str, credentials: Dict[str, str]) -> Dict[str, Any]:
         """
         Simulate bank API connection for demo purposes
         In production, this would integrate with actual bank APIs (Plaid, Yodlee, etc.)
@@ -30,9 +32,8 @@ class BankingService:
                 "supported_banks": self.supported_banks
             }
         
-        # Simulate connection delay
-        import time
-        time.sleep(random.uniform(1, 3))
+        # Simulate connection delay without blocking the event loop
+        await asyncio.sleep(random.uniform(1, 3))
         
         # Simulate occasional connection failures (10% chance)
         if random.random() < 0.1:
@@ -65,43 +66,54 @@ class BankingService:
         Key metrics for SMB owners and executive decision making
         """
         # Get current balance across all accounts
-        accounts = execute_query("SELECT * FROM accounts")
-        total_balance = sum(float(acc.get('balance', 0)) for acc in accounts)
+        accounts = execute_query(
+            "SELECT COUNT(*) AS account_count, COALESCE(SUM(balance), 0) AS total_balance FROM accounts"
+        )[0]
+        total_balance = accounts['total_balance']
         
-        # Get recent transactions (last 30 days)
+        # Aggregate the last 30 days per category in SQLite instead of
+        # pulling every recent transaction into Python
         thirty_days_ago = datetime.now() - timedelta(days=30)
-        recent_transactions = execute_query(
-            "SELECT * FROM transactions WHERE date >= ? ORDER BY date DESC",
+        category_rows = execute_query(
+            """SELECT category,
+                      COUNT(*) AS count,
+                      SUM(amount) AS total,
+                      SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) AS inflows,
+                      SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END) AS outflows
+               FROM transactions
+               WHERE date >= ?
+               GROUP BY category""",
             (thirty_days_ago.isoformat(),)
         )
         
         # Calculate cash flow metrics
-        total_inflows = sum(
-            float(t['amount']) for t in recent_transactions 
-            if float(t['amount']) > 0
-        )
-        total_outflows = abs(sum(
-            float(t['amount']) for t in recent_transactions 
-            if float(t['amount']) < 0
-        ))
+        total_inflows = sum(row['inflows'] for row in category_rows)
+        total_outflows = abs(sum(row['outflows'] for row in category_rows))
         net_cash_flow = total_inflows - total_outflows
+        total_transactions = sum(row['count'] for row in category_rows)
         
         # Category analysis
-        category_breakdown = {}
-        for transaction in recent_transactions:
-            category = transaction.get('category', 'Uncategorized')
-            amount = float(transaction['amount'])
-            if category not in category_breakdown:
-                category_breakdown[category] = {'count': 0, 'total': 0}
-            category_breakdown[category]['count'] += 1
-            category_breakdown[category]['total'] += amount
-        
-        # Sort categories by absolute total amount
-        sorted_categories = sorted(
+        category_breakdown = {
+            row['category']: {'count': row['count'], 'total': row['total']}
+            for row in category_rows
+        }
+        
+        # Top 10 categories by absolute total amount, without sorting them all
+        sorted_categories = heapq.nlargest(
+            10,
             category_breakdown.items(),
-            key=lambda x: abs(x[1]['total']),
-            reverse=True
-        )[:10]  # Top 10 categories
+            key=lambda x: abs(x[1]['total'])
+        )
+        
+        # Largest expense category: the top categories are already ranked by
+        # absolute total, so only scan the rest when none of them is an expense
+        largest_expense = next((cat for cat in sorted_categories if cat[1]['total'] < 0), None)
+        if largest_expense is None and len(category_breakdown) > len(sorted_categories):
+            largest_expense = max(
+                ((k, v) for k, v in category_breakdown.items() if v['total'] < 0),
+                key=lambda x: abs(x[1]['total']),
+                default=None
+            )
         
         # Cash burn rate (average daily outflow)
         if total_outflows > 0:
@@ -137,9 +149,9 @@ class BankingService:
         return {
             "summary": {
                 "total_balance": total_balance,
-                "total_accounts": len(accounts),
+                "total_accounts": accounts['account_count'],
                 "net_cash_flow_30d": net_cash_flow,
-                "total_transactions_30d": len(recent_transactions)
+                "total_transactions_30d": total_transactions
             },
             "cash_flow": {
                 "inflows_30d": total_inflows,
@@ -159,7 +171,7 @@ class BankingService:
             ],
             "alerts": alerts,
             "recommendations": self._generate_recommendations(
-                total_balance, net_cash_flow, days_of_cash, category_breakdown
+                total_balance, net_cash_flow, days_of_cash, largest_expense
             ),
             "generated_at": datetime.now().isoformat()
         }
@@ -169,7 +181,7 @@ class BankingService:
         balance: float, 
         net_flow: float, 
         days_of_cash: float, 
-        categories: Dict[str, Dict[str, float]]
+        largest_expense: Optional[Tuple[str, Dict[str, float]]]
     ) -> List[Dict[str, str]]:
         """Generate actionable recommendations based on financial data"""
         recommendations = []
@@ -209,20 +221,13 @@ class BankingService:
             })
         
         # Category-specific recommendations
-        if categories:
-            largest_expense = max(
-                ((k, v) for k, v in categories.items() if v['total'] < 0),
-                key=lambda x: abs(x[1]['total']),
-                default=None
-            )
-            
-            if largest_expense and abs(largest_expense[1]['total']) > 1000:
-                recommendations.append({
-                    "type": "optimization",
-                    "priority": "medium",
-                    "title": f"Optimize {largest_expense[0]} Spending",
-                    "description": f"Your largest expense category ({largest_expense[0]}: ${abs(largest_expense[1]['total']):,.2f}) may have optimization opportunities."
-                })
+        if largest_expense and abs(largest_expense[1]['total']) > 1000:
+            recommendations.append({
+                "type": "optimization",
+                "priority": "medium",
+                "title": f"Optimize {largest_expense[0]} Spending",
+                "description": f"Your largest expense category ({largest_expense[0]}: ${abs(largest_expense[1]['total']):,.2f}) may have optimization opportunities."
+            })
         
         return recommendations[:5]  # Limit to top 5 recommendations
 
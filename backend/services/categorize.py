@@ -4,10 +4,76 @@ Enhanced categorization with learning from corrections
 """
 
 import re
-from typing import Dict, List, Tuple, Optional
+import numpy as np
+import pandas as pd
+from functools import partial
+from typing import Any, Callable, Dict, List, Tuple, Optional, Pattern
 from datetime import datetime
 from db import execute_query, generate_id
 
+# Characters that make a pattern more than a plain substring
+_REGEX_METACHARS = re.compile(r'[.^$*+?{}\[\]\\|()]')
+_WORD_RE = re.compile(r'\w+')
+
+def _compile_matcher(pattern: str) -> Callable[[str], Any]:
+    """Build a predicate for a pattern, skipping the regex engine for plain literals"""
+    fragments = pattern.split('.*')
+    if not all(fragments) or any(_REGEX_METACHARS.search(fragment) for fragment in fragments):
+        return re.compile(pattern).search
+    
+    if len(fragments) == 1:
+        return lambda text: pattern in text
+    
+    # 'a.*b' style patterns: find each fragment after the end of the previous one
+    regex = re.compile(pattern)
+    
+    def match_chain(text: str) -> Any:
+        if '\n' in text:
+            # '.' doesn't cross newlines, so leave those to the regex
+            return regex.search(text)
+        position = 0
+        for fragment in fragments:
+            position = text.find(fragment, position)
+            if position < 0:
+                return False
+            position += len(fragment)
+        return True
+    
+    return match_chain
+
+def _pattern_words(pattern: str) -> Tuple[str, ...]:
+    """Words of a pattern used for confidence scoring"""
+    return tuple(_WORD_RE.findall(pattern.replace('.*', ' ')))
+
+# Length of the leading-literal key used to bucket built-in patterns
+_PREFIX_KEY_LENGTH = 3
+
+def _prefix_key(pattern: str) -> Optional[str]:
+    """Leading characters any match of the pattern must contain, if known"""
+    leading = pattern.split('.*')[0]
+    if len(leading) < _PREFIX_KEY_LENGTH or _REGEX_METACHARS.search(pattern.replace('.*', '')):
+        return None
+    return leading[:_PREFIX_KEY_LENGTH]
+
+def _length_bonus(pattern: str) -> float:
+    """Confidence bonus for longer, more specific patterns"""
+    if len(pattern) > 20:
+        return 0.05
+    elif len(pattern) > 10:
+        return 0.02
+    return 0.0
+
+# Fallback categorization by amount for descriptions that matched nothing:
+# large revenue, other revenue, major expense, other expense
+LARGE_REVENUE_THRESHOLD = 10000
+MAJOR_EXPENSE_THRESHOLD = 5000
+AMOUNT_FALLBACKS = (
+    ('Revenue - Large Payment', 0.3, 'Large positive amount suggests revenue'),
+    ('Revenue - Other', 0.2, 'Positive amount suggests revenue'),
+    ('Major Expense', 0.3, 'Large negative amount'),
+    ('Other Expenses', 0.2, 'General business expense'),
+)
+
 class CategorizationService:
     """Enhanced transaction categorization with ML-like behavior"""
     
@@ -84,8 +150,28 @@ class CategorizationService:
             ]
         }
         
+        # Flattened (category, pattern, predicate, words, length bonus) list
+        # built once; literal patterns use substring checks instead of regex
+        self.category_matchers = [
+            (category, pattern, _compile_matcher(pattern), _pattern_words(pattern), _length_bonus(pattern))
+            for category, patterns in self.categories.items()
+            for pattern in patterns
+        ]
+        
+        # Bucket matchers by the start of their leading literal, so a description
+        # only runs the patterns whose key occurs in it; the rest always run
+        self.matcher_index: Dict[str, List[int]] = {}
+        self.unindexed_matchers: List[int] = []
+        for position, (_, pattern, *_) in enumerate(self.category_matchers):
+            key = _prefix_key(pattern)
+            if key is None:
+                self.unindexed_matchers.append(position)
+            else:
+                self.matcher_index.setdefault(key, []).append(position)
+        
         # Load user-defined rules
         self.user_rules = self._load_user_rules()
+        self.user_rules_matcher = self._compile_user_rules(self.user_rules)
         
         # Load learning data from corrections
         self.learning_patterns = self._load_learning_patterns()
@@ -96,15 +182,57 @@ class CategorizationService:
         Returns: (category, confidence, explanation)
         """
         description_lower = description.lower().strip()
+        return self.match_description(description_lower) or self.categorize_by_amount(amount)
+    
+    def categorize_batch(self, descriptions: pd.Series, amounts: pd.Series) -> Tuple[List[str], List[float], List[str]]:
+        """
+        Categorize many transactions at once, matching each distinct description once
+        Returns: (categories, confidences, explanations) in row order
+        """
+        if len(descriptions) == 0:
+            return [], [], []
         
+        # Repeated merchants share a code, so only the distinct raw descriptions
+        # are normalized; spellings that normalize alike are merged again
+        raw_codes, raw_uniques = pd.factorize(pd.Series(descriptions), use_na_sentinel=False)
+        normalized = pd.Series(raw_uniques, dtype=object).astype(str).str.lower().str.strip()
+        unique_codes, uniques = pd.factorize(normalized)
+        codes = unique_codes[raw_codes]
+        matches = [self.match_description(description) for description in uniques]
+        
+        # Every row points either at its description's match or, when that
+        # matched nothing, at the amount fallback, and results are gathered at once
+        amounts = np.asarray(amounts, dtype=float)
+        positive = amounts > 0
+        fallback = np.select(
+            [positive & (amounts > LARGE_REVENUE_THRESHOLD), positive, np.abs(amounts) > MAJOR_EXPENSE_THRESHOLD],
+            [0, 1, 2],
+            default=3
+        )
+        matched = np.array([match is not None for match in matches], dtype=bool)[codes]
+        result_index = np.where(matched, codes, len(matches) + fallback)
+        
+        results = [match or AMOUNT_FALLBACKS[0] for match in matches] + list(AMOUNT_FALLBACKS)
+        categories, confidences, explanations = (np.array(column, dtype=object) for column in zip(*results))
+        return (
+            categories[result_index].tolist(),
+            confidences[result_index].tolist(),
+            explanations[result_index].tolist()
+        )
+    
+    def match_description(self, description_lower: str) -> Optional[Tuple[str, float, str]]:
+        """
+        Categorize from a lowercased, stripped description alone
+        Returns None when no rule or pattern matches
+        """
         # Check user-defined rules first (highest priority)
-        for rule in self.user_rules:
-            if re.search(rule['pattern'], description_lower):
-                return (
-                    rule['category'], 
-                    rule['confidence'],
-                    f"Matched user rule: '{rule['pattern']}'"
-                )
+        rule = self.user_rules_matcher(description_lower)
+        if rule:
+            return (
+                rule['category'], 
+                rule['confidence'],
+                f"Matched user rule: '{rule['pattern']}'"
+            )
         
         # Check learned patterns from corrections
         learned_result = self._check_learned_patterns(description_lower)
@@ -116,16 +244,19 @@ class CategorizationService:
         best_score = 0.0
         matched_patterns = []
         
-        for category, patterns in self.categories.items():
-            for pattern in patterns:
-                if re.search(pattern, description_lower):
-                    # Calculate confidence based on pattern specificity
-                    confidence = self._calculate_pattern_confidence(pattern, description_lower)
-                    matched_patterns.append((category, confidence, pattern))
-                    
-                    if confidence > best_score:
-                        best_score = confidence
-                        best_match = (category, confidence, pattern)
+        description_words = None
+        
+        for category, pattern, matches, pattern_words, length_bonus in self._candidate_matchers(description_lower):
+            if matches(description_lower):
+                # Calculate confidence based on pattern specificity
+                if description_words is None:
+                    description_words = frozenset(description_lower.split())
+                confidence = self._calculate_pattern_confidence(pattern_words, length_bonus, description_words)
+                matched_patterns.append((category, confidence, pattern))
+                
+                if confidence > best_score:
+                    best_score = confidence
+                    best_match = (category, confidence, pattern)
         
         if best_match:
             category, confidence, pattern = best_match
@@ -138,43 +269,121 @@ class CategorizationService:
             
             return (category, confidence, explanation)
         
+        return None
+    
+    def _candidate_matchers(self, description_lower: str) -> List[Tuple]:
+        """Built-in matchers that could match the description, in declaration order"""
+        candidates = set(self.unindexed_matchers)
+        index = self.matcher_index
+        keys = {
+            description_lower[start:start + _PREFIX_KEY_LENGTH]
+            for start in range(len(description_lower) - _PREFIX_KEY_LENGTH + 1)
+        }
+        for key in keys:
+            positions = index.get(key)
+            if positions:
+                candidates.update(positions)
+        return [self.category_matchers[position] for position in sorted(candidates)]
+    
+    def categorize_by_amount(self, amount: float) -> Tuple[str, float, str]:
+        """Fallback categorization for descriptions that matched nothing"""
         # Amount-based categorization for uncategorized transactions
         if amount > 0:
-            if amount > 10000:
-                return ('Revenue - Large Payment', 0.3, 'Large positive amount suggests revenue')
+            if amount > LARGE_REVENUE_THRESHOLD:
+                return AMOUNT_FALLBACKS[0]
             else:
-                return ('Revenue - Other', 0.2, 'Positive amount suggests revenue')
+                return AMOUNT_FALLBACKS[1]
         else:
-            if abs(amount) > 5000:
-                return ('Major Expense', 0.3, 'Large negative amount')
+            if abs(amount) > MAJOR_EXPENSE_THRESHOLD:
+                return AMOUNT_FALLBACKS[2]
             else:
-                return ('Other Expenses', 0.2, 'General business expense')
+                return AMOUNT_FALLBACKS[3]
     
-    def _calculate_pattern_confidence(self, pattern: str, description: str) -> float:
+    def _compile_user_rules(self, rules: List[Dict]) -> Callable[[str], Optional[Dict]]:
+        """Build a function returning the first user rule that matches a description"""
+        if not rules:
+            return lambda description: None
+        
+        # Plain substrings need no regex engine at all
+        if all(_REGEX_METACHARS.search(rule['pattern']) is None for rule in rules):
+            literals = tuple((rule['pattern'], rule) for rule in rules)
+            
+            def match_literals(description: str) -> Optional[Dict]:
+                for literal, rule in literals:
+                    if literal in description:
+                        return rule
+                return None
+            
+            return match_literals
+        
+        combined = self._combine_user_rules(rules)
+        if combined is not None:
+            def match_combined(description: str) -> Optional[Dict]:
+                match = combined.match(description)
+                return rules[int(match.lastgroup[5:])] if match else None
+            
+            return match_combined
+        
+        matchers = []
+        for rule in rules:
+            try:
+                matchers.append((_compile_matcher(rule['pattern']), rule))
+            except re.error:
+                # Invalid patterns keep failing at match time, as before
+                matchers.append((partial(re.search, rule['pattern']), rule))
+        
+        def match_each(description: str) -> Optional[Dict]:
+            for matches, rule in matchers:
+                if matches(description):
+                    return rule
+            return None
+        
+        return match_each
+    
+    def _combine_user_rules(self, rules: List[Dict]) -> Optional[Pattern]:
+        """Compile all user rules into one regex that reports the first matching rule"""
+        # Numbered backreferences would point at the wrong group once combined
+        if any(re.search(r'\\[1-9]', rule['pattern']) for rule in rules):
+            return None
+        
+        # Alternatives are tried in rule order, each searching the whole
+        # description via lookahead, so the first rule to match wins exactly
+        # as with one re.search per rule
+        alternatives = '|'.join(
+            f"(?=(?s:.*?)(?:{rule['pattern']}))(?P<_rule{index}>)"
+            for index, rule in enumerate(rules)
+        )
+        try:
+            return re.compile(f"(?:{alternatives})")
+        except re.error:
+            # Patterns using global inline flags can't be combined;
+            # fall back to matching rules one at a time
+            return None
+    
+    def _calculate_pattern_confidence(
+        self, 
+        pattern_words: Tuple[str, ...], 
+        length_bonus: float, 
+        description_words: frozenset
+    ) -> float:
         """Calculate confidence score based on pattern match quality"""
         # Base confidence
         confidence = 0.7
         
         # Exact word matches increase confidence
-        pattern_words = re.findall(r'\w+', pattern.replace('.*', ' '))
-        description_words = description.split()
-        
         exact_matches = sum(1 for word in pattern_words if word in description_words)
         if exact_matches > 0:
             confidence += 0.1 * exact_matches
         
         # Longer patterns are more specific
-        if len(pattern) > 20:
-            confidence += 0.05
-        elif len(pattern) > 10:
-            confidence += 0.02
+        confidence += length_bonus
         
         return min(0.9, confidence)  # Cap at 0.9 for pattern matches
     
     def _load_user_rules(self) -> List[Dict]:
         """Load user-defined categorization rules"""
         try:
-            rules = execute_query("SELECT * FROM rules ORDER BY confidence DESC")
+            rules = execute_query("SELECT * FROM rules ORDER BY confidence DESC, id")
             return [
                 {
                     'pattern': rule['description_pattern'],
@@ -188,28 +397,63 @@ class CategorizationService:
     
     def _load_learning_patterns(self) -> Dict[str, Dict]:
         """Load patterns learned from user corrections"""
+        self.correction_counts = self._load_correction_counts()
+        
+        self.learned_word_index = {}
+        self.learned_rank = {}
+        
+        patterns = {}
+        for desc_key, category_counts in self.correction_counts.items():
+            pattern = self._learned_pattern(category_counts)
+            if pattern:
+                patterns[desc_key] = pattern
+                self._index_learned_description(desc_key)
+        
+        return patterns
+    
+    def _index_learned_description(self, desc_key: str):
+        """Add a learned description to the word -> descriptions index"""
+        # Load order breaks ties between equally frequent partial matches
+        self.learned_rank[desc_key] = len(self.learned_rank)
+        for word in set(desc_key.split()):
+            self.learned_word_index.setdefault(word, []).append(desc_key)
+    
+    def _load_correction_counts(self) -> Dict[str, Dict[str, int]]:
+        """Load correction counts per normalized description and category"""
         try:
             corrections = execute_query("""
                 SELECT t.description, c.new_category, COUNT(*) as frequency
                 FROM corrections c
                 JOIN transactions t ON c.transaction_id = t.id
                 GROUP BY LOWER(t.description), c.new_category
-                HAVING frequency >= 2
-                ORDER BY frequency DESC
             """)
-            
-            patterns = {}
-            for correction in corrections:
-                desc_key = correction['description'].lower().strip()
-                patterns[desc_key] = {
-                    'category': correction['new_category'],
-                    'confidence': min(0.85, 0.6 + 0.1 * correction['frequency']),
-                    'frequency': correction['frequency']
-                }
-            
-            return patterns
         except:
             return {}
+        
+        counts = {}
+        for correction in corrections:
+            desc_key = correction['description'].lower().strip()
+            category_counts = counts.setdefault(desc_key, {})
+            category_counts[correction['new_category']] = (
+                category_counts.get(correction['new_category'], 0) + correction['frequency']
+            )
+        
+        return counts
+    
+    def _learned_pattern(self, category_counts: Dict[str, int]) -> Optional[Dict]:
+        """Build the learned pattern for one description from its correction counts"""
+        # Categories need at least two corrections; as before, when several
+        # qualify the least frequent one is the entry that ends up kept
+        qualifying = [(count, category) for category, count in category_counts.items() if count >= 2]
+        if not qualifying:
+            return None
+        
+        frequency, category = min(qualifying)
+        return {
+            'category': category,
+            'confidence': min(0.85, 0.6 + 0.1 * frequency),
+            'frequency': frequency
+        }
     
     def _check_learned_patterns(self, description: str) -> Optional[Tuple[str, float, str]]:
         """Check if description matches learned patterns from corrections"""
@@ -223,18 +467,37 @@ class CategorizationService:
             )
         
         # Partial match for similar descriptions
-        for learned_desc, pattern in self.learning_patterns.items():
-            # Simple similarity check
-            if len(description) > 5 and len(learned_desc) > 5:
-                common_words = set(description.split()) & set(learned_desc.split())
-                if len(common_words) >= 2 and len(common_words) / len(set(description.split())) > 0.5:
-                    return (
-                        pattern['category'],
-                        pattern['confidence'] * 0.8,  # Reduce confidence for partial match
-                        f"Similar to learned pattern (freq: {pattern['frequency']})"
-                    )
+        if len(description) <= 5:
+            return None
         
-        return None
+        # Count shared words only for learned descriptions that share any,
+        # using the word index instead of comparing against every pattern
+        description_words = set(description.split())
+        common_counts = {}
+        for word in description_words:
+            for learned_desc in self.learned_word_index.get(word, ()):
+                common_counts[learned_desc] = common_counts.get(learned_desc, 0) + 1
+        
+        # Simple similarity check; the most frequently corrected description
+        # wins, and among equals the one loaded first
+        best_desc = None
+        best_frequency = 0
+        for learned_desc in sorted(common_counts, key=self.learned_rank.__getitem__):
+            common_words = common_counts[learned_desc]
+            if len(learned_desc) > 5 and common_words >= 2 and common_words / len(description_words) > 0.5:
+                frequency = max(self.correction_counts[learned_desc].values())
+                if frequency > best_frequency:
+                    best_desc, best_frequency = learned_desc, frequency
+        
+        if best_desc is None:
+            return None
+        
+        pattern = self.learning_patterns[best_desc]
+        return (
+            pattern['category'],
+            pattern['confidence'] * 0.8,  # Reduce confidence for partial match
+            f"Similar to learned pattern (freq: {pattern['frequency']})"
+        )
     
     def create_rule(self, description_pattern: str, category: str, confidence: float = 0.95) -> str:
         """Create a new categorization rule"""
@@ -244,13 +507,25 @@ class CategorizationService:
             (rule_id, description_pattern, category, confidence)
         )
         
-        # Refresh user rules
-        self.user_rules = self._load_user_rules()
+        # Slot the new rule in after rules of equal or higher confidence,
+        # matching the (confidence DESC, time-ordered id) load order
+        position = next(
+            (index for index, rule in enumerate(self.user_rules) if rule['confidence'] < confidence),
+            len(self.user_rules)
+        )
+        self.user_rules.insert(position, {
+            'pattern': description_pattern,
+            'category': category,
+            'confidence': float(confidence)
+        })
+        self.user_rules_matcher = self._compile_user_rules(self.user_rules)
         
         return rule_id
     
     def record_correction(self, transaction_id: str, old_category: str, new_category: str) -> str:
         """Record a user correction for learning"""
+        transaction = execute_query("SELECT description FROM transactions WHERE id = ?", (transaction_id,))
+        
         correction_id = generate_id()
         execute_query(
             "INSERT INTO corrections (id, transaction_id, old_category, new_category) VALUES (?, ?, ?, ?)",
@@ -263,8 +538,17 @@ class CategorizationService:
             (new_category, transaction_id)
         )
         
-        # Refresh learning patterns
-        self.learning_patterns = self._load_learning_patterns()
+        # Update the learned pattern for this description in place
+        if transaction:
+            desc_key = transaction[0]['description'].lower().strip()
+            category_counts = self.correction_counts.setdefault(desc_key, {})
+            category_counts[new_category] = category_counts.get(new_category, 0) + 1
+            
+            pattern = self._learned_pattern(category_counts)
+            if pattern:
+                if desc_key not in self.learning_patterns:
+                    self._index_learned_description(desc_key)
+                self.learning_patterns[desc_key] = pattern
         
         return correction_id
     
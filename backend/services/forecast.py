@@ -3,12 +3,92 @@ SMB-Focused Cash Flow Forecasting Service for BannkMint AI Banking OS
 Phase 3B: Advanced forecasting with crisis alerts and scenario planning
 """
 
-from typing import Dict, List, Optional, Any, Tuple
-from datetime import datetime, timedelta
-import statistics
-from collections import defaultdict
+from typing import Dict, List, Optional, Any, Sequence, Tuple
+from datetime import date, datetime, timedelta
+import copy
+import sqlite3
+from dataclasses import dataclass
+from functools import lru_cache
 import math
-from db import execute_query
+import numpy as np
+from db import execute_query, data_version
+
+# Distinct (weeks, scenario, seasonal, day, data version) forecasts kept
+FORECAST_CACHE_SIZE = 64
+
+# Forecast SQL kept as fixed module-level text so each pooled connection's
+# statement cache prepares it once and reuses the compiled statement
+BALANCE_QUERY = "SELECT COALESCE(SUM(balance), 0.0) AS total FROM accounts"
+
+# Total and count per week and category. Weeks are keyed like
+# strftime("%Y-W%U") (Sunday-first), which SQLite lacks, so the week number
+# is derived from the day of year and weekday. Groups come back in order of
+# their first transaction, which keeps categories and their weekly totals
+# in chronological order.
+WEEKLY_TOTALS_QUERY = """
+    SELECT strftime('%Y', date) || '-W' || printf('%02d',
+               (CAST(strftime('%j', date) AS INTEGER) + 6
+                - CAST(strftime('%w', date) AS INTEGER)) / 7) AS week,
+           category,
+           SUM(amount) AS total,
+           COUNT(*) AS count
+    FROM transactions
+    WHERE date >= ?
+    GROUP BY week, category
+    ORDER BY MIN(date), MIN(rowid)
+"""
+
+@dataclass
+class ProjectionBatch:
+    """Weekly projections stored column-wise: one entry per week, categories across breakdown"""
+    weeks: List[int]
+    dates: List[str]
+    inflows: np.ndarray
+    outflows: np.ndarray
+    net_flows: np.ndarray
+    confidences: np.ndarray
+    breakdown: np.ndarray
+    categories: List[str]
+    category_confidences: np.ndarray
+    balances: Optional[np.ndarray] = None  # running balance after each week, set once per scenario
+    
+    def __len__(self) -> int:
+        return len(self.weeks)
+    
+    def running_balances(self, starting_balance: float) -> np.ndarray:
+        """Balance after each week; seeding the cumsum adds in the same order as a loop"""
+        return np.cumsum(np.concatenate(([starting_balance], self.net_flows)))[1:]
+    
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Per-week projection dicts as returned by the API, as plain Python floats"""
+        category_confidences = self.category_confidences.tolist()
+        projections = []
+        for index, (week, date_str, inflow, outflow, net_flow, confidence, week_amounts) in enumerate(zip(
+            self.weeks, self.dates, self.inflows.tolist(), self.outflows.tolist(),
+            self.net_flows.tolist(), self.confidences.tolist(), self.breakdown.tolist()
+        )):
+            projection = {
+                "week": week,
+                "date": date_str,
+                "projected_inflows": inflow,
+                "projected_outflows": outflow,
+                "net_flow": net_flow,
+                "confidence": confidence,
+                "category_breakdown": {
+                    category: {"projected_amount": amount, "confidence": category_confidence}
+                    for category, amount, category_confidence in zip(self.categories, week_amounts, category_confidences)
+                }
+            }
+            if self.balances is not None:
+                projection["projected_balance"] = float(self.balances[index])
+            projections.append(projection)
+        return projections
+
+@lru_cache(maxsize=64)
+def _centered_positions(n: int) -> np.ndarray:
+    """Week positions 0..n-1 minus their mean, shared by every series of length n"""
+    positions = np.arange(n, dtype=np.float64)
+    return positions - (n - 1) / 2
 
 class ForecastingService:
     """Advanced cash flow forecasting tailored for SMB needs"""
@@ -18,6 +98,9 @@ class ForecastingService:
         self.confidence_threshold = 0.7
         self.crisis_threshold = 1000  # Alert if projected balance goes below this
         
+        # Forecasts memoized per day and data version; see generate_cash_flow_forecast
+        self._cached_forecast = lru_cache(maxsize=FORECAST_CACHE_SIZE)(self._build_cash_flow_forecast)
+        
     def generate_cash_flow_forecast(
         self, 
         weeks: int = 8, 
@@ -27,23 +110,80 @@ class ForecastingService:
         """
         Generate comprehensive cash flow forecast
         Scenarios: 'optimistic', 'base', 'pessimistic'
+        Returns JSON-native values only (no numpy types), so any encoder works
         """
         if weeks not in self.forecast_periods:
             weeks = 8  # Default to 8-week forecast
-            
+        
+        # Repeated requests on the same day reuse the forecast until the data
+        # changes; callers get a copy so the cached one is never mutated
+        forecast = self._cached_forecast(
+            weeks, scenario, include_seasonal, datetime.now().date(), data_version()
+        )
+        return copy.deepcopy(forecast)
+    
+    def _build_cash_flow_forecast(
+        self,
+        weeks: int,
+        scenario: str,
+        include_seasonal: bool,
+        as_of: date,
+        data_version: Tuple
+    ) -> Dict[str, Any]:
+        """Run the forecast pipeline; as_of and data_version only key the cache"""
         # Get current balance
         current_balance = self._get_current_balance()
         
         # Analyze historical patterns
         historical_data = self._analyze_historical_patterns(weeks * 2)  # Use 2x weeks for analysis
         
-        # Generate weekly projections
+        return self._project_scenario(weeks, scenario, include_seasonal, current_balance, historical_data)
+    
+    def generate_scenarios(
+        self,
+        weeks: int = 8,
+        include_seasonal: bool = True,
+        scenarios: Sequence[str] = ("optimistic", "base", "pessimistic")
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Generate forecasts for several scenarios from one historical analysis
+        Returns a forecast per scenario, shaped like generate_cash_flow_forecast
+        """
+        if weeks not in self.forecast_periods:
+            weeks = 8  # Default to 8-week forecast
+        
+        # Balance, history and the per-category arrays are scenario independent
+        current_balance = self._get_current_balance()
+        historical_data = self._analyze_historical_patterns(weeks * 2)
+        pattern_arrays = self._pattern_arrays(historical_data.get("weekly_patterns", {}))
+        
+        return {
+            scenario: self._project_scenario(
+                weeks, scenario, include_seasonal, current_balance, historical_data, pattern_arrays
+            )
+            for scenario in scenarios
+        }
+    
+    def _project_scenario(
+        self,
+        weeks: int,
+        scenario: str,
+        include_seasonal: bool,
+        current_balance: float,
+        historical_data: Dict,
+        pattern_arrays: Optional[Tuple] = None
+    ) -> Dict[str, Any]:
+        """Build one scenario's forecast from an already analyzed history"""
+        # Generate weekly projections; kept column-wise until the response
         projections = self._calculate_weekly_projections(
-            weeks, historical_data, scenario, include_seasonal
+            weeks, historical_data, scenario, include_seasonal, pattern_arrays
         )
         
+        # Running balances computed once, shared by crisis detection and metrics
+        projections.balances = projections.running_balances(current_balance)
+        
         # Detect crisis points
-        crisis_alerts = self._detect_crisis_points(projections, current_balance)
+        crisis_alerts = self._detect_crisis_points(projections)
         
         # Calculate key metrics
         metrics = self._calculate_forecast_metrics(projections, current_balance)
@@ -57,11 +197,11 @@ class ForecastingService:
             "forecast_period": f"{weeks} weeks",
             "scenario": scenario,
             "current_balance": current_balance,
-            "projections": projections,
+            "projections": projections.to_dicts(),
             "key_metrics": metrics,
             "crisis_alerts": crisis_alerts,
             "recommendations": recommendations,
-            "confidence_factors": historical_data.get("confidence_factors", {}),
+            "confidence_factors": dict(historical_data.get("confidence_factors", {})),
             "seasonal_adjustments": include_seasonal,
             "generated_at": datetime.now().isoformat()
         }
@@ -69,9 +209,8 @@ class ForecastingService:
     def _get_current_balance(self) -> float:
         """Get current total balance across all accounts"""
         try:
-            accounts = execute_query("SELECT balance FROM accounts")
-            return sum(float(acc['balance']) for acc in accounts)
-        except:
+            return float(execute_query(BALANCE_QUERY)[0]['total'])
+        except sqlite3.Error:
             return 0.0
     
     def _analyze_historical_patterns(self, analysis_weeks: int) -> Dict[str, Any]:
@@ -79,45 +218,39 @@ class ForecastingService:
         end_date = datetime.now()
         start_date = end_date - timedelta(weeks=analysis_weeks)
         
-        # Get historical transactions
-        transactions = execute_query(
-            "SELECT * FROM transactions WHERE date >= ? ORDER BY date",
-            (start_date.isoformat(),)
-        )
+        # Total and count per week and category, grouped by SQLite
+        weekly_rows = execute_query(WEEKLY_TOTALS_QUERY, (start_date.isoformat(),))
         
-        if not transactions:
+        if not weekly_rows:
             return {"weekly_patterns": {}, "confidence_factors": {}}
         
-        # Group by week and category
-        weekly_data = defaultdict(lambda: defaultdict(list))
-        
-        for trans in transactions:
-            trans_date = datetime.fromisoformat(trans['date'].replace('Z', '+00:00'))
-            week_key = trans_date.strftime("%Y-W%U")  # Year-Week format
-            category = trans.get('category', 'Other')
-            amount = float(trans['amount'])
-            
-            weekly_data[week_key][category].append(amount)
-        
-        # Calculate weekly patterns by category
+        # Calculate weekly patterns by category: one dict lookup per row for
+        # the category and one for the week, without default factories
         category_patterns = {}
-        
-        for week, categories in weekly_data.items():
-            for category, amounts in categories.items():
-                if category not in category_patterns:
-                    category_patterns[category] = {
-                        'weekly_totals': [],
-                        'transaction_counts': [],
-                        'avg_transaction_size': []
-                    }
-                
-                weekly_total = sum(amounts)
-                count = len(amounts)
-                avg_size = weekly_total / count if count > 0 else 0
-                
-                category_patterns[category]['weekly_totals'].append(weekly_total)
-                category_patterns[category]['transaction_counts'].append(count)
-                category_patterns[category]['avg_transaction_size'].append(avg_size)
+        weekly_totals = {}
+        transaction_count = 0
+        
+        for row in weekly_rows:
+            category = row['category']
+            pattern = category_patterns.get(category)
+            if pattern is None:
+                pattern = category_patterns[category] = {
+                    'weekly_totals': [],
+                    'transaction_counts': [],
+                    'avg_transaction_size': []
+                }
+            
+            weekly_total = row['total']
+            count = row['count']
+            avg_size = weekly_total / count if count > 0 else 0
+            
+            pattern['weekly_totals'].append(weekly_total)
+            pattern['transaction_counts'].append(count)
+            pattern['avg_transaction_size'].append(avg_size)
+            
+            week = row['week']
+            weekly_totals[week] = weekly_totals.get(week, 0.0) + weekly_total
+            transaction_count += count
         
         # Calculate statistics for each category
         pattern_analysis = {}
@@ -125,12 +258,10 @@ class ForecastingService:
         
         for category, data in category_patterns.items():
             if len(data['weekly_totals']) >= 2:
-                totals = data['weekly_totals']
-                mean_total = statistics.mean(totals)
-                std_dev = statistics.stdev(totals) if len(totals) > 1 else 0
+                totals = np.asarray(data['weekly_totals'], dtype=np.float64)
                 
-                # Calculate trend
-                trend = self._calculate_trend(totals)
+                # Mean, spread and trend in one pass over the totals
+                mean_total, std_dev, trend = self._summarize_weekly_totals(totals)
                 
                 # Calculate confidence based on consistency
                 coefficient_of_variation = (std_dev / abs(mean_total)) if mean_total != 0 else 1
@@ -142,8 +273,8 @@ class ForecastingService:
                     'trend': trend,
                     'confidence': confidence,
                     'sample_size': len(totals),
-                    'avg_transaction_count': statistics.mean(data['transaction_counts']),
-                    'avg_transaction_size': statistics.mean(data['avg_transaction_size'])
+                    'avg_transaction_count': float(np.mean(data['transaction_counts'])),
+                    'avg_transaction_size': float(np.mean(data['avg_transaction_size']))
                 }
                 
                 overall_confidence += confidence * abs(mean_total)
@@ -156,28 +287,28 @@ class ForecastingService:
             "weekly_patterns": pattern_analysis,
             "confidence_factors": {
                 "overall_confidence": overall_confidence,
-                "data_quality": min(1.0, len(transactions) / 100),  # More transactions = better quality
+                "data_quality": min(1.0, transaction_count / 100),  # More transactions = better quality
                 "pattern_stability": self._calculate_pattern_stability(category_patterns),
-                "seasonal_detected": self._detect_seasonal_patterns(weekly_data)
+                "seasonal_detected": self._detect_seasonal_patterns(weekly_totals)
             }
         }
     
-    def _calculate_trend(self, values: List[float]) -> float:
-        """Calculate trend using simple linear regression slope"""
-        if len(values) < 2:
-            return 0.0
-        
-        n = len(values)
-        x_values = list(range(n))
-        
-        # Calculate slope using least squares
-        x_mean = sum(x_values) / n
-        y_mean = sum(values) / n
-        
-        numerator = sum((x - x_mean) * (y - y_mean) for x, y in zip(x_values, values))
-        denominator = sum((x - x_mean) ** 2 for x in x_values)
-        
-        return numerator / denominator if denominator != 0 else 0.0
+    def _summarize_weekly_totals(self, totals: np.ndarray) -> Tuple[float, float, float]:
+        """Mean, sample standard deviation and linear regression slope of weekly totals"""
+        n = totals.size
+        mean = totals.mean()
+        if n < 2:
+            return float(mean), 0.0, 0.0
+        
+        # Deviations from the mean are computed once and shared: the variance
+        # is their sum of squares, and since the centered week positions sum to
+        # zero the least squares slope is their dot product with those
+        # positions over the closed form n(n^2 - 1)/12
+        deviations = totals - mean
+        std_dev = math.sqrt(float(np.dot(deviations, deviations)) / (n - 1))
+        slope = float(np.dot(_centered_positions(n), deviations)) / (n * (n * n - 1) / 12)
+        
+        return float(mean), std_dev, slope
     
     def _calculate_pattern_stability(self, category_patterns: Dict) -> float:
         """Calculate how stable the patterns are across categories"""
@@ -187,77 +318,67 @@ class ForecastingService:
         stability_scores = []
         
         for category, data in category_patterns.items():
-            totals = data['weekly_totals']
-            if len(totals) >= 3:
+            if len(data['weekly_totals']) >= 3:
+                totals = np.asarray(data['weekly_totals'], dtype=np.float64)
                 # Calculate how much weekly values deviate from mean
-                mean_val = statistics.mean(totals)
+                mean_val = totals.mean()
                 if mean_val != 0:
-                    deviations = [abs(val - mean_val) / abs(mean_val) for val in totals]
-                    stability = 1 - min(1.0, statistics.mean(deviations))
+                    mean_deviation = float(np.abs((totals - mean_val) / mean_val).mean())
+                    stability = 1 - min(1.0, mean_deviation)
                     stability_scores.append(stability)
         
-        return statistics.mean(stability_scores) if stability_scores else 0.5
+        return float(np.mean(stability_scores)) if stability_scores else 0.5
     
-    def _detect_seasonal_patterns(self, weekly_data: Dict) -> bool:
+    def _detect_seasonal_patterns(self, weekly_totals_by_week: Dict[str, float]) -> bool:
         """Simple seasonal pattern detection"""
         # This is a simplified implementation
         # In production, would use more sophisticated time series analysis
-        if len(weekly_data) < 8:  # Need at least 8 weeks of data
+        if len(weekly_totals_by_week) < 8:  # Need at least 8 weeks of data
             return False
         
         # Check if there are recurring patterns in weekly totals
-        weekly_totals = []
-        sorted_weeks = sorted(weekly_data.keys())
-        
-        for week in sorted_weeks:
-            week_total = sum(sum(amounts) for amounts in weekly_data[week].values())
-            weekly_totals.append(week_total)
-        
-        # Simple check for cyclical patterns
-        if len(weekly_totals) >= 4:
-            # Check for 4-week cycles (monthly patterns)
-            correlations = []
-            for offset in [4, 8]:  # 4-week and 8-week cycles
-                if len(weekly_totals) > offset:
-                    correlation = self._calculate_correlation(
-                        weekly_totals[:-offset], 
-                        weekly_totals[offset:]
-                    )
-                    correlations.append(abs(correlation))
-            
-            return any(corr > 0.3 for corr in correlations)
+        sorted_weeks = sorted(weekly_totals_by_week.keys())
+        weekly_totals = np.array([weekly_totals_by_week[week] for week in sorted_weeks])
+        
+        # Simple check for cyclical patterns: 4-week (monthly) then 8-week
+        # cycles, stopping at the first one found
+        for offset in (4, 8):
+            if len(weekly_totals) > offset:
+                correlation = self._calculate_correlation(
+                    weekly_totals[:-offset], 
+                    weekly_totals[offset:]
+                )
+                if abs(correlation) > 0.3:
+                    return True
         
         return False
     
-    def _calculate_correlation(self, x: List[float], y: List[float]) -> float:
+    def _calculate_correlation(self, x: Sequence[float], y: Sequence[float]) -> float:
         """Calculate Pearson correlation coefficient"""
         if len(x) != len(y) or len(x) < 2:
             return 0.0
         
-        n = len(x)
-        sum_x = sum(x)
-        sum_y = sum(y)
-        sum_xy = sum(xi * yi for xi, yi in zip(x, y))
-        sum_x2 = sum(xi * xi for xi in x)
-        sum_y2 = sum(yi * yi for yi in y)
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
         
-        denominator = math.sqrt((n * sum_x2 - sum_x * sum_x) * (n * sum_y2 - sum_y * sum_y))
-        
-        if denominator == 0:
+        # Constant series have no defined correlation
+        if x.std() == 0 or y.std() == 0:
             return 0.0
         
-        return (n * sum_xy - sum_x * sum_y) / denominator
+        return float(np.corrcoef(x, y)[0, 1])
     
     def _calculate_weekly_projections(
         self, 
         weeks: int, 
         historical_data: Dict, 
         scenario: str,
-        include_seasonal: bool
-    ) -> List[Dict[str, Any]]:
+        include_seasonal: bool,
+        pattern_arrays: Optional[Tuple] = None
+    ) -> ProjectionBatch:
         """Calculate weekly cash flow projections"""
-        projections = []
-        patterns = historical_data.get("weekly_patterns", {})
+        if pattern_arrays is None:
+            pattern_arrays = self._pattern_arrays(historical_data.get("weekly_patterns", {}))
+        categories, means, trends, confidences = pattern_arrays
         
         # Scenario multipliers
         scenario_multipliers = {
@@ -268,142 +389,133 @@ class ForecastingService:
         
         multipliers = scenario_multipliers.get(scenario, scenario_multipliers["base"])
         
-        for week in range(1, weeks + 1):
-            week_projection = {
-                "week": week,
-                "date": (datetime.now() + timedelta(weeks=week)).strftime("%Y-%m-%d"),
-                "projected_inflows": 0.0,
-                "projected_outflows": 0.0,
-                "net_flow": 0.0,
-                "confidence": 0.0,
-                "category_breakdown": {}
-            }
-            
-            total_confidence_weight = 0.0
-            weighted_confidence = 0.0
-            
-            for category, pattern in patterns.items():
-                base_amount = pattern['mean_weekly']
-                
-                # Apply trend
-                trend_adjustment = pattern['trend'] * week
-                projected_amount = base_amount + trend_adjustment
-                
-                # Apply scenario multipliers
-                if projected_amount > 0:  # Revenue
-                    projected_amount *= multipliers["revenue"]
-                else:  # Expenses
-                    projected_amount *= multipliers["expenses"]
-                
-                # Apply seasonal adjustments (simplified)
-                if include_seasonal and week % 4 == 0:  # Every 4th week
-                    seasonal_factor = 1.1 if projected_amount > 0 else 0.9
-                    projected_amount *= seasonal_factor
-                
-                week_projection["category_breakdown"][category] = {
-                    "projected_amount": projected_amount,
-                    "confidence": pattern['confidence']
-                }
-                
-                # Aggregate flows
-                if projected_amount > 0:
-                    week_projection["projected_inflows"] += projected_amount
-                else:
-                    week_projection["projected_outflows"] += abs(projected_amount)
-                
-                # Weight confidence by transaction volume
-                weight = abs(projected_amount)
-                weighted_confidence += pattern['confidence'] * weight
-                total_confidence_weight += weight
-            
-            week_projection["net_flow"] = (
-                week_projection["projected_inflows"] - 
-                week_projection["projected_outflows"]
+        # Project every (week, category) cell at once: rows are weeks 1..weeks,
+        # columns follow the order of the category patterns
+        week_numbers = np.arange(1, weeks + 1, dtype=np.float64)
+        
+        # Apply trend
+        amounts = means + np.outer(week_numbers, trends)
+        
+        # Apply scenario multipliers: revenue when positive, expenses otherwise.
+        # Multipliers are positive, so the sign mask holds for every later step.
+        is_revenue = amounts > 0
+        amounts *= np.where(is_revenue, multipliers["revenue"], multipliers["expenses"])
+        
+        # Apply seasonal adjustments (simplified): every 4th week, as per-week
+        # factors for each sign (1.0 elsewhere) rather than a row selection
+        if include_seasonal:
+            seasonal_weeks = (week_numbers % 4 == 0)[:, None]
+            amounts *= np.where(
+                is_revenue,
+                np.where(seasonal_weeks, 1.1, 1.0),
+                np.where(seasonal_weeks, 0.9, 1.0)
             )
-            
-            week_projection["confidence"] = (
-                weighted_confidence / total_confidence_weight 
-                if total_confidence_weight > 0 else 0.5
+        
+        # Aggregate flows, weighting confidence by transaction volume: inflow,
+        # outflow, confidence-weighted and total volume per week in one reduction
+        weights = np.abs(amounts)
+        inflows, outflows, weighted_confidences, total_confidence_weights = np.stack((
+            np.where(is_revenue, weights, 0.0),
+            np.where(is_revenue, 0.0, weights),
+            weights * confidences,
+            weights
+        )).sum(axis=2)
+        
+        # Weeks without any projected volume fall back to neutral confidence
+        with np.errstate(divide='ignore', invalid='ignore'):
+            week_confidences = np.where(
+                total_confidence_weights > 0, weighted_confidences / total_confidence_weights, 0.5
             )
-            
-            projections.append(week_projection)
         
-        return projections
+        now = datetime.now()
+        return ProjectionBatch(
+            weeks=list(range(1, weeks + 1)),
+            dates=[(now + timedelta(weeks=week)).strftime("%Y-%m-%d") for week in range(1, weeks + 1)],
+            inflows=inflows,
+            outflows=outflows,
+            net_flows=inflows - outflows,
+            confidences=week_confidences,
+            breakdown=amounts,
+            categories=categories,
+            category_confidences=confidences
+        )
+    
+    def _pattern_arrays(self, patterns: Dict[str, Dict]) -> Tuple[List, np.ndarray, np.ndarray, np.ndarray]:
+        """Categories with their mean, trend and confidence as parallel arrays"""
+        return (
+            list(patterns),
+            np.array([pattern['mean_weekly'] for pattern in patterns.values()], dtype=np.float64),
+            np.array([pattern['trend'] for pattern in patterns.values()], dtype=np.float64),
+            np.array([pattern['confidence'] for pattern in patterns.values()], dtype=np.float64)
+        )
     
     def _detect_crisis_points(
         self, 
-        projections: List[Dict], 
-        starting_balance: float
+        projections: ProjectionBatch
     ) -> List[Dict[str, Any]]:
         """Detect potential cash flow crisis points"""
         alerts = []
-        running_balance = starting_balance
+        balances = projections.balances
+        
+        # Crisis below the threshold (critical once negative); low balance
+        # warning below 5x the threshold
+        crisis = balances < self.crisis_threshold
+        warning = ~crisis & (balances < self.crisis_threshold * 5)
         
-        for projection in projections:
-            running_balance += projection["net_flow"]
+        for index in np.flatnonzero(crisis | warning).tolist():
+            week = projections.weeks[index]
+            running_balance = float(balances[index])
             
-            # Crisis detection
-            if running_balance < self.crisis_threshold:
+            if crisis[index]:
                 severity = "critical" if running_balance < 0 else "high"
-                
-                alerts.append({
-                    "week": projection["week"],
-                    "date": projection["date"],
-                    "projected_balance": running_balance,
-                    "severity": severity,
-                    "message": (
-                        f"Cash flow crisis projected in Week {projection['week']}: "
-                        f"Balance drops to ${running_balance:,.2f}"
-                    ),
-                    "confidence": projection["confidence"]
-                })
-            
-            # Low balance warning
-            elif running_balance < self.crisis_threshold * 5:  # 5x crisis threshold
-                alerts.append({
-                    "week": projection["week"],
-                    "date": projection["date"],
-                    "projected_balance": running_balance,
-                    "severity": "medium",
-                    "message": (
-                        f"Low balance warning in Week {projection['week']}: "
-                        f"Balance projected at ${running_balance:,.2f}"
-                    ),
-                    "confidence": projection["confidence"]
-                })
+                message = (
+                    f"Cash flow crisis projected in Week {week}: "
+                    f"Balance drops to ${running_balance:,.2f}"
+                )
+            else:
+                severity = "medium"
+                message = (
+                    f"Low balance warning in Week {week}: "
+                    f"Balance projected at ${running_balance:,.2f}"
+                )
             
-            # Update balance for next iteration
-            projection["projected_balance"] = running_balance
+            alerts.append({
+                "week": week,
+                "date": projections.dates[index],
+                "projected_balance": running_balance,
+                "severity": severity,
+                "message": message,
+                "confidence": float(projections.confidences[index])
+            })
         
         return alerts
     
     def _calculate_forecast_metrics(
         self, 
-        projections: List[Dict], 
+        projections: ProjectionBatch, 
         starting_balance: float
     ) -> Dict[str, Any]:
         """Calculate key forecast metrics"""
-        if not projections:
+        if not len(projections):
             return {}
         
-        total_inflows = sum(p["projected_inflows"] for p in projections)
-        total_outflows = sum(p["projected_outflows"] for p in projections)
+        total_inflows = float(projections.inflows.sum())
+        total_outflows = float(projections.outflows.sum())
         net_flow = total_inflows - total_outflows
         
         # Calculate average weekly flows
         avg_weekly_inflow = total_inflows / len(projections)
         avg_weekly_outflow = total_outflows / len(projections)
         
-        # Find minimum balance week
-        min_balance = starting_balance
-        min_balance_week = 0
-        running_balance = starting_balance
-        
-        for projection in projections:
-            running_balance += projection["net_flow"]
-            if running_balance < min_balance:
-                min_balance = running_balance
-                min_balance_week = projection["week"]
+        # Find minimum balance week (week 0 if it never drops below the start)
+        balances = projections.balances
+        min_index = int(np.argmin(balances))
+        if balances[min_index] < starting_balance:
+            min_balance = float(balances[min_index])
+            min_balance_week = projections.weeks[min_index]
+        else:
+            min_balance = starting_balance
+            min_balance_week = 0
         
         # Calculate cash runway (weeks until balance hits zero)
         cash_runway = None
@@ -412,7 +524,7 @@ class ForecastingService:
             cash_runway = starting_balance / weekly_burn if weekly_burn > 0 else None
         
         # Overall forecast confidence
-        overall_confidence = sum(p["confidence"] for p in projections) / len(projections)
+        overall_confidence = float(projections.confidences.mean())
         
         return {
             "total_projected_inflows": total_inflows,
@@ -424,13 +536,13 @@ class ForecastingService:
             "minimum_balance": min_balance,
             "minimum_balance_week": min_balance_week,
             "cash_runway_weeks": cash_runway,
-            "ending_balance": projections[-1]["projected_balance"] if projections else starting_balance,
+            "ending_balance": float(balances[-1]),
             "overall_confidence": overall_confidence
         }
     
     def _generate_forecast_recommendations(
         self,
-        projections: List[Dict],
+        projections: ProjectionBatch,
         crisis_alerts: List[Dict],
         metrics: Dict,
         scenario: str
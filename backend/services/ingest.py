@@ -3,16 +3,45 @@ CSV ingestion and normalization service for BannkMint AI
 Enhanced with robust parsing and deduplication
 """
 
+import gzip
+import numpy as np
 import pandas as pd
 import re
-from typing import Dict, List, Optional, Any, Tuple
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Any, Tuple, Union
+from collections import Counter
 from datetime import datetime
-import hashlib
 import uuid
-from io import StringIO
-from db import execute_query, get_or_create_account, generate_id
+from io import BytesIO, StringIO
+import sqlite3
+from db import (
+    execute_query, execute_many, get_or_create_account, generate_id, transaction_hash,
+    write_transaction, REVIEW_CONFIDENCE_THRESHOLD
+)
 from .categorize import categorization_service
 
+# Leading bytes of a gzip stream
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Rows parsed and pushed through the pipeline at a time, bounding memory use
+CSV_CHUNK_ROWS = 50_000
+
+# Candidate delimiters in order of preference, and how much of the upload
+# is read to find the header line
+CSV_DELIMITERS = [',', ';', '\t', '|']
+DELIMITER_SNIFF_BYTES = 64 * 1024
+
+# Currency symbols and separators stripped from amounts, compiled once
+AMOUNT_NOISE_RE = re.compile(r'[$£€¥₹,\s]')
+
+# Characters dropped from headers that match no known column, and how many
+# distinct raw headers keep their resolved name cached
+HEADER_CLEANUP_RE = re.compile(r'[^\w\s]')
+HEADER_CACHE_SIZE = 1024
+
+# Hashes per IN (...) lookup, under SQLite's default bound-parameter limit
+HASH_LOOKUP_BATCH = 900
+
 class IngestionService:
     """Enhanced CSV ingestion with intelligent parsing and deduplication"""
     
@@ -34,21 +63,52 @@ class IngestionService:
             '%Y/%m/%d', '%d-%m-%Y', '%b %d, %Y', '%B %d, %Y',
             '%m/%d/%y', '%d/%m/%y', '%y-%m-%d'
         ]
+        
+        # (variation, standard name) pairs flattened in priority order, and the
+        # resolved name per raw header, since every chunk repeats the same headers
+        self.header_variations = tuple(
+            (variation, standard_name)
+            for standard_name, variations in self.header_mappings.items()
+            for variation in variations
+        )
+        self._standard_header = lru_cache(maxsize=HEADER_CACHE_SIZE)(self._resolve_header)
     
     def process_csv_upload(
         self, 
-        csv_content: str, 
+        csv_content: Union[str, bytes], 
         account_name: str = "Default Account",
         account_type: str = "checking"
     ) -> Dict[str, Any]:
         """
         Process uploaded CSV with intelligent parsing and categorization
         """
+        # Step 1: Parse CSV content in chunks (raw upload bytes are read without decoding first)
+        return self._process_chunks(self._iter_csv_chunks(csv_content), account_name, account_type)
+    
+    def process_csv_dataframe(
+        self, 
+        df: pd.DataFrame, 
+        account_name: str = "Default Account",
+        account_type: str = "checking"
+    ) -> Dict[str, Any]:
+        """
+        Process an already parsed CSV frame through normalization, dedup and categorization
+        """
+        return self._process_chunks(iter([df]), account_name, account_type)
+    
+    def _process_chunks(
+        self, 
+        chunks: Iterator[pd.DataFrame], 
+        account_name: str,
+        account_type: str
+    ) -> Dict[str, Any]:
+        """
+        Run each parsed chunk through the pipeline and into the database,
+        accumulating the upload summary as it goes
+        """
         try:
-            # Step 1: Parse CSV content
-            df = self._parse_csv_content(csv_content)
-            
-            if df.empty:
+            df = next(chunks, None)
+            if df is None or df.empty:
                 return {
                     "success": False,
                     "error": "CSV file is empty or invalid",
@@ -68,40 +128,81 @@ class IngestionService:
                     "processed_count": 0
                 }
             
-            # Step 4: Clean and normalize data
-            df = self._clean_and_normalize_data(df)
-            
-            # Step 5: Get or create account
+            # Step 4: Get or create account
             account_id = get_or_create_account(account_name, account_type)
             
-            # Step 6: Deduplicate transactions
-            df, duplicate_count = self._deduplicate_transactions(df, account_id)
-            
-            # Step 7: Categorize transactions
-            df = self._categorize_transactions(df)
+            inserted_count = 0
+            kept_count = 0
+            duplicate_count = 0
+            row_offset = 0
+            earliest = latest = None
+            total_credits = total_debits = net_amount = 0.0
+            categories_detected = Counter()
+            confident_count = 0
             
-            # Step 8: Insert into database
-            inserted_count = self._insert_transactions(df, account_id)
-            
-            # Step 9: Update account balance
-            self._update_account_balance(account_id, df)
+            # The whole upload is one transaction: a chunk that fails to parse
+            # or insert rolls back the chunks before it
+            with write_transaction() as conn:
+                while df is not None:
+                    # Step 5: Clean and normalize data
+                    df = self._clean_and_normalize_data(df)
+                    chunk_rows = len(df)
+                    
+                    # Step 6: Deduplicate transactions, including against the
+                    # chunks of this upload that are already inserted
+                    df, chunk_duplicates = self._deduplicate_transactions(df, account_id, conn)
+                    duplicate_count += chunk_duplicates
+                    
+                    if not df.empty:
+                        kept_count += len(df)
+                        
+                        # Step 7: Categorize transactions
+                        df = self._categorize_transactions(df)
+                        
+                        # Step 8: Insert into database; rows that lost a race with a
+                        # concurrent upload of the same transactions are skipped
+                        chunk_inserted = self._insert_transactions(df, account_id, conn, row_offset)
+                        inserted_count += chunk_inserted
+                        duplicate_count += len(df) - chunk_inserted
+                        
+                        chunk_earliest, chunk_latest = df['date'].min(), df['date'].max()
+                        earliest = chunk_earliest if earliest is None else min(earliest, chunk_earliest)
+                        latest = chunk_latest if latest is None else max(latest, chunk_latest)
+                        # Sign masks over one float array rather than filtered Series copies
+                        amounts = df['amount'].to_numpy(dtype=float)
+                        total_credits += float(amounts[amounts > 0].sum())
+                        total_debits += float(amounts[amounts < 0].sum())
+                        net_amount += float(amounts.sum())
+                        categories_detected.update(df['category'].value_counts().to_dict())
+                        confident_count += self._confident_count(df)
+                    
+                    row_offset += chunk_rows
+                    df = next(chunks, None)
+                    if df is not None:
+                        df = self._normalize_headers(df)
+                
+                # Step 9: Update account balance once for the whole upload,
+                # committed together with the inserted rows
+                if inserted_count:
+                    self._update_account_balance(account_id, conn)
             
             return {
                 "success": True,
                 "account_id": account_id,
                 "processed_count": inserted_count,
                 "duplicate_count": duplicate_count,
-                "total_rows": len(df) + duplicate_count,
+                "total_rows": inserted_count + duplicate_count,
                 "date_range": {
-                    "earliest": df['date'].min().isoformat() if not df.empty else None,
-                    "latest": df['date'].max().isoformat() if not df.empty else None
+                    "earliest": earliest.isoformat() if earliest is not None else None,
+                    "latest": latest.isoformat() if latest is not None else None
                 },
                 "amount_summary": {
-                    "total_credits": float(df[df['amount'] > 0]['amount'].sum()) if not df.empty else 0,
-                    "total_debits": float(df[df['amount'] < 0]['amount'].sum()) if not df.empty else 0,
-                    "net_amount": float(df['amount'].sum()) if not df.empty else 0
+                    "total_credits": total_credits,
+                    "total_debits": total_debits,
+                    "net_amount": net_amount
                 },
-                "categories_detected": df['category'].value_counts().to_dict() if 'category' in df.columns else {}
+                "categories_detected": dict(categories_detected.most_common()),
+                "categorized_pct": round(confident_count / kept_count * 100, 1) if kept_count else 0.0
             }
             
         except Exception as e:
@@ -111,63 +212,92 @@ class IngestionService:
                 "processed_count": 0
             }
     
-    def _parse_csv_content(self, csv_content: str) -> pd.DataFrame:
-        """Parse CSV content with various delimiters and encodings"""
-        # Try different delimiters
-        delimiters = [',', ';', '\t', '|']
+    def _iter_csv_chunks(self, csv_content: Union[str, bytes]) -> Iterator[pd.DataFrame]:
+        """Parse CSV content with various delimiters and encodings, CSV_CHUNK_ROWS rows at a time"""
+        buffer_type = BytesIO if isinstance(csv_content, bytes) else StringIO
+        
+        # Gzipped uploads are decompressed by the parser instead of up front
+        compression = 'gzip' if isinstance(csv_content, bytes) and csv_content[:2] == GZIP_MAGIC else None
         
-        for delimiter in delimiters:
+        # Pick the delimiter from the header line, then parse once with the C engine
+        delimiter = self._detect_delimiter(csv_content, compression)
+        if delimiter is not None:
             try:
-                # Try reading with current delimiter
-                df = pd.read_csv(
-                    StringIO(csv_content),
+                reader = pd.read_csv(
+                    buffer_type(csv_content),
+                    compression=compression,
                     delimiter=delimiter,
                     encoding='utf-8',
                     skipinitialspace=True,
                     na_values=['', 'NULL', 'null', 'N/A', 'n/a'],
-                    keep_default_na=True
+                    keep_default_na=True,
+                    chunksize=CSV_CHUNK_ROWS
                 )
+                df = next(reader, None)
                 
                 # Check if we got meaningful columns (more than 1 column with data)
-                if len(df.columns) > 1 and not df.empty:
-                    return df
+                if df is not None and len(df.columns) > 1 and not df.empty:
+                    yield df
+                    yield from reader
+                    return
                     
             except Exception:
-                continue
+                pass
         
-        # If all delimiters fail, try a more lenient approach
+        # If no delimiter fits, try a more lenient approach
         try:
-            df = pd.read_csv(
-                StringIO(csv_content),
+            reader = pd.read_csv(
+                buffer_type(csv_content),
+                compression=compression,
                 sep=None,  # Let pandas detect separator
                 engine='python',
                 encoding='utf-8',
-                skipinitialspace=True
+                skipinitialspace=True,
+                chunksize=CSV_CHUNK_ROWS
             )
-            return df
+            df = next(reader, None)
         except Exception:
-            return pd.DataFrame()
+            return
+        if df is not None:
+            yield df
+            yield from reader
+    
+    def _detect_delimiter(self, csv_content: Union[str, bytes], compression: Optional[str]) -> Optional[str]:
+        """First candidate delimiter that splits the header line, or None"""
+        try:
+            if compression == 'gzip':
+                with gzip.GzipFile(fileobj=BytesIO(csv_content)) as stream:
+                    head = stream.read(DELIMITER_SNIFF_BYTES)
+            else:
+                head = csv_content[:DELIMITER_SNIFF_BYTES]
+            if isinstance(head, bytes):
+                head = head.decode('utf-8', errors='ignore')
+        except Exception:
+            return None
+        
+        # Blank leading lines are skipped by the parser, so skip them here too
+        header = next((line for line in head.splitlines() if line.strip()), '')
+        return next((delimiter for delimiter in CSV_DELIMITERS if delimiter in header), None)
     
     def _normalize_headers(self, df: pd.DataFrame) -> pd.DataFrame:
         """Normalize column headers to standard format"""
-        header_map = {}
-        
-        for col in df.columns:
-            col_lower = str(col).lower().strip()
-            
-            # Find the best match for this column
-            for standard_name, variations in self.header_mappings.items():
-                if any(variation in col_lower for variation in variations):
-                    header_map[col] = standard_name
-                    break
-            
-            # If no match found, keep original but cleaned
-            if col not in header_map:
-                header_map[col] = re.sub(r'[^\w\s]', '', col_lower).replace(' ', '_')
+        header_map = {col: self._standard_header(str(col)) for col in df.columns}
         
         df = df.rename(columns=header_map)
         return df
     
+    def _resolve_header(self, col: str) -> str:
+        """Standard name for a raw column header"""
+        col_lower = col.lower().strip()
+        
+        # Find the best match for this column
+        for variation, standard_name in self.header_variations:
+            if variation in col_lower:
+                return standard_name
+        
+        # If no match found, keep original but cleaned
+        return HEADER_CLEANUP_RE.sub('', col_lower).replace(' ', '_')
+    
     def _validate_required_columns(self, df: pd.DataFrame) -> Dict[str, Any]:
         """Validate that required columns are present"""
         required_columns = ['date', 'description']
@@ -195,8 +325,8 @@ class IngestionService:
     
     def _clean_and_normalize_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """Clean and normalize transaction data"""
-        # Create a copy to avoid modifying original
-        df = df.copy()
+        # No defensive copy: the frame comes from _normalize_headers, whose
+        # rename already returns a new frame, so the caller's stays untouched
         
         # Clean date column
         df['date'] = self._parse_dates(df['date'])
@@ -211,14 +341,17 @@ class IngestionService:
             # Clean existing amount column
             df['amount'] = self._clean_amount_column(df['amount'])
         
-        # Clean description
-        df['description'] = df['description'].astype(str).str.strip()
-        df['description'] = df['description'].replace('nan', '')
+        # Clean description; missing values become empty rather than 'nan'
+        missing = df['description'].isna()
+        descriptions = df['description'].astype(str).str.strip()
+        if missing.any():
+            descriptions[missing] = ''
+        df['description'] = descriptions
         
-        # Remove rows with invalid data
-        df = df.dropna(subset=['date', 'description'])
-        df = df[df['description'] != '']
-        df = df[df['amount'] != 0]  # Remove zero-amount transactions
+        # Remove rows with invalid data (missing date, empty description or
+        # zero amount) with a single combined mask
+        valid = df['date'].notna() & (df['description'] != '') & (df['amount'] != 0)
+        df = df[valid]
         
         # Sort by date
         df = df.sort_values('date').reset_index(drop=True)
@@ -227,29 +360,26 @@ class IngestionService:
     
     def _parse_dates(self, date_series: pd.Series) -> pd.Series:
         """Parse dates using multiple format attempts"""
-        parsed_dates = pd.Series(index=date_series.index, dtype='datetime64[ns]')
-        
-        for idx, date_val in date_series.items():
-            if pd.isna(date_val):
-                continue
-                
-            date_str = str(date_val).strip()
-            
-            # Try each date format
-            for date_format in self.date_formats:
-                try:
-                    parsed_date = pd.to_datetime(date_str, format=date_format)
-                    parsed_dates.iloc[idx] = parsed_date
-                    break
-                except (ValueError, TypeError):
-                    continue
-            
-            # If no format worked, try pandas' automatic parsing
-            if pd.isna(parsed_dates.iloc[idx]):
-                try:
-                    parsed_dates.iloc[idx] = pd.to_datetime(date_str, infer_datetime_format=True)
-                except:
-                    pass
+        parsed_dates = pd.Series(pd.NaT, index=date_series.index, dtype='datetime64[ns]')
+        date_strs = date_series[date_series.notna()].astype(str).str.strip()
+        
+        # Try each format on every value still unparsed, one vectorized call per
+        # format; the first format that parses a value wins, as before
+        for date_format in self.date_formats:
+            if date_strs.empty:
+                break
+            parsed = pd.to_datetime(date_strs, format=date_format, errors='coerce')
+            matched = parsed.notna()
+            parsed_dates.loc[parsed.index[matched]] = parsed[matched]
+            date_strs = date_strs[~matched]
+        
+        # If no format worked, try pandas' automatic parsing value by value
+        if not date_strs.empty:
+            parsed = pd.to_datetime(date_strs, format='mixed', errors='coerce')
+            if parsed.dtype != parsed_dates.dtype:
+                # Timezone-aware values don't fit the naive column
+                parsed_dates = parsed_dates.astype(object)
+            parsed_dates.loc[parsed.index] = parsed
         
         return parsed_dates
     
@@ -259,155 +389,189 @@ class IngestionService:
         cleaned = amount_series.astype(str)
         
         # Remove common currency symbols and formatting
-        cleaned = cleaned.str.replace(r'[$£€¥₹,\s]', '', regex=True)
+        cleaned = cleaned.str.replace(AMOUNT_NOISE_RE, '', regex=True)
         
-        # Handle parentheses as negative (accounting format)
-        mask = cleaned.str.contains(r'\(.*\)', regex=True, na=False)
-        cleaned.loc[mask] = '-' + cleaned.loc[mask].str.replace(r'[()]', '', regex=True)
+        # Handle parentheses wrapping the value as negative (accounting format)
+        # with plain prefix/suffix checks; most uploads have none
+        mask = cleaned.str.startswith('(') & cleaned.str.endswith(')')
+        if mask.any():
+            cleaned.loc[mask] = '-' + cleaned.loc[mask].str.slice(1, -1)
         
         # Convert to numeric
         return pd.to_numeric(cleaned, errors='coerce').fillna(0)
     
-    def _deduplicate_transactions(self, df: pd.DataFrame, account_id: str) -> Tuple[pd.DataFrame, int]:
-        """Remove duplicate transactions based on hash matching"""
+    def _stored_hashes(self, account_id: str, hashes: pd.Series, conn: sqlite3.Connection) -> np.ndarray:
+        """Sorted array of the given hashes already stored for an account"""
+        candidates = hashes.unique().tolist()
+        stored = []
+        for start in range(0, len(candidates), HASH_LOOKUP_BATCH):
+            batch = candidates[start:start + HASH_LOOKUP_BATCH]
+            placeholders = ', '.join(['?'] * len(batch))
+            rows = conn.execute(
+                f"SELECT transaction_hash FROM transactions WHERE account_id = ? AND transaction_hash IN ({placeholders})",
+                (account_id, *batch)
+            )
+            stored.extend(row[0] for row in rows)
+        return np.unique(np.array(stored, dtype=np.int64))
+    
+    def _deduplicate_transactions(
+        self, 
+        df: pd.DataFrame, 
+        account_id: str, 
+        conn: sqlite3.Connection
+    ) -> Tuple[pd.DataFrame, int]:
+        """Remove duplicate transactions based on hash matching, on the upload's connection"""
         if df.empty:
             return df, 0
         
-        # Create transaction hashes
-        df['transaction_hash'] = df.apply(self._create_transaction_hash, axis=1)
+        # Create transaction hashes for the whole frame at once
+        df['transaction_hash'] = self._transaction_hashes(
+            self._day_strings(df['date']), df['description'], df['amount']
+        )
         
-        # Get existing transaction hashes from database
-        existing_hashes = set()
+        # Only this chunk's hashes are looked up, via the (account_id, transaction_hash)
+        # index; the unique index still rejects any duplicate that slips past this
+        existing_hashes = np.empty(0, dtype=np.int64)
         try:
-            existing_transactions = execute_query(
-                "SELECT DISTINCT date || '|' || description || '|' || CAST(amount AS TEXT) as hash_key FROM transactions WHERE account_id = ?",
-                (account_id,)
-            )
-            existing_hashes = {self._create_hash_from_db_row(row) for row in existing_transactions}
+            existing_hashes = self._stored_hashes(account_id, df['transaction_hash'], conn)
         except:
             pass
         
         # Filter out duplicates
         initial_count = len(df)
-        df = df[~df['transaction_hash'].isin(existing_hashes)]
-        duplicate_count = initial_count - len(df)
+        df = df[~np.isin(df['transaction_hash'].values, existing_hashes)]
         
-        # Remove duplicates within the current dataset
+        # Remove duplicates within the current dataset; these count as
+        # duplicates too, so totals don't depend on how rows fall into chunks
         df = df.drop_duplicates(subset=['transaction_hash'])
+        duplicate_count = initial_count - len(df)
         
         return df, duplicate_count
     
-    def _create_transaction_hash(self, row) -> str:
-        """Create a hash for duplicate detection"""
-        # Use date, description, and amount for hash
-        hash_string = f"{row['date'].date()}|{row['description']}|{row['amount']}"
-        return hashlib.md5(hash_string.encode()).hexdigest()
+    def _day_strings(self, dates: pd.Series) -> pd.Series:
+        """Calendar day of each parsed date as YYYY-MM-DD"""
+        if pd.api.types.is_datetime64_dtype(dates):
+            return dates.dt.strftime('%Y-%m-%d')
+        # Mixed timezone-aware values are left as Timestamp objects
+        return dates.map(lambda date: date.date().isoformat())
     
-    def _create_hash_from_db_row(self, row) -> str:
-        """Create hash from database row for comparison"""
-        return hashlib.md5(row['hash_key'].encode()).hexdigest()
+    def _iso_strings(self, dates: pd.Series) -> List[str]:
+        """ISO 8601 text of each parsed date, as stored in the transactions table"""
+        if pd.api.types.is_datetime64_dtype(dates) and (dates == dates.dt.floor('s')).all():
+            return dates.dt.strftime('%Y-%m-%dT%H:%M:%S').tolist()
+        # Fractional seconds and timezone offsets are left to isoformat()
+        return [date.isoformat() for date in dates]
+    
+    def _transaction_hashes(self, days: pd.Series, descriptions: pd.Series, amounts: pd.Series) -> pd.Series:
+        """64-bit hash of (day, description, amount) per row for duplicate detection"""
+        # db.transaction_hash is a fixed BLAKE2b scheme, so stored keys stay valid
+        # across library upgrades; amounts are hashed as floats to match REAL values
+        hashes = [
+            transaction_hash(day, description, amount)
+            for day, description, amount in zip(
+                days.tolist(), descriptions.tolist(), amounts.astype(float).tolist()
+            )
+        ]
+        return pd.Series(hashes, index=days.index, dtype=np.int64)
     
     def _categorize_transactions(self, df: pd.DataFrame) -> pd.DataFrame:
         """Categorize transactions using the categorization service"""
         if df.empty:
             return df
         
-        df['category'] = ''
-        df['confidence'] = 0.0
-        df['explanation'] = ''
-        
-        for idx, row in df.iterrows():
-            category, confidence, explanation = categorization_service.categorize_transaction(
-                row['description'], 
-                row['amount']
-            )
-            
-            df.at[idx, 'category'] = category
-            df.at[idx, 'confidence'] = confidence
-            df.at[idx, 'explanation'] = explanation
-        
-        return df
+        categories, confidences, explanations = categorization_service.categorize_batch(
+            df['description'], df['amount']
+        )
+        return df.assign(category=categories, confidence=confidences, explanation=explanations)
     
-    def _insert_transactions(self, df: pd.DataFrame, account_id: str) -> int:
-        """Insert transactions into database"""
-        if df.empty:
+    def _confident_count(self, df: pd.DataFrame) -> int:
+        """Number of rows categorized confidently enough to skip manual review"""
+        if df.empty or 'confidence' not in df.columns:
             return 0
         
-        inserted_count = 0
-        
-        for idx, row in df.iterrows():
-            try:
-                transaction_id = generate_id()
-                
-                execute_query(
-                    """INSERT INTO transactions 
-                       (id, account_id, date, description, amount, category, confidence, explanation, original_csv_row) 
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                    (
-                        transaction_id,
-                        account_id,
-                        row['date'].isoformat(),
-                        row['description'],
-                        float(row['amount']),
-                        row.get('category', ''),
-                        float(row.get('confidence', 0.0)),
-                        row.get('explanation', ''),
-                        int(idx)
-                    )
-                )
-                inserted_count += 1
-                
-            except Exception as e:
-                print(f"Error inserting transaction {idx}: {e}")
-                continue
-        
-        return inserted_count
+        confident = (df['confidence'] >= REVIEW_CONFIDENCE_THRESHOLD) & (df['category'] != 'Uncategorized')
+        return int(confident.sum())
     
-    def _update_account_balance(self, account_id: str, df: pd.DataFrame):
-        """Update account balance based on transaction amounts"""
+    def _insert_transactions(
+        self, 
+        df: pd.DataFrame, 
+        account_id: str, 
+        conn: sqlite3.Connection, 
+        row_offset: int = 0
+    ) -> int:
+        """Insert transactions within the upload's transaction, numbering CSV rows from row_offset"""
         if df.empty:
-            return
-        
-        # Calculate total change from this upload
-        total_change = float(df['amount'].sum())
+            return 0
         
-        # Update account balance
-        try:
-            execute_query(
-                "UPDATE accounts SET balance = balance + ? WHERE id = ?",
-                (total_change, account_id)
-            )
-        except Exception as e:
-            print(f"Error updating account balance: {e}")
+        # Convert whole columns once and zip them into parameter tuples
+        n = len(df)
+        categories = df['category'].tolist() if 'category' in df.columns else [''] * n
+        confidences = df['confidence'].astype(float).tolist() if 'confidence' in df.columns else [0.0] * n
+        explanations = df['explanation'].tolist() if 'explanation' in df.columns else [''] * n
+        rows = zip(
+            (generate_id() for _ in range(n)),
+            [account_id] * n,
+            self._iso_strings(df['date']),
+            df['description'].tolist(),
+            df['amount'].astype(float).tolist(),
+            categories,
+            confidences,
+            explanations,
+            (df.index.to_numpy(dtype=np.int64) + row_offset).tolist(),
+            df['transaction_hash'].tolist()
+        )
+        
+        # Batched executemany on the upload's connection; every chunk joins the
+        # single upload transaction, committed once by _process_chunks
+        return execute_many(
+            """INSERT INTO transactions 
+               (id, account_id, date, description, amount, category, confidence, explanation, original_csv_row, transaction_hash) 
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (account_id, transaction_hash) DO NOTHING""",
+            rows,
+            conn
+        )
+    
+    def _update_account_balance(self, account_id: str, conn: sqlite3.Connection):
+        """Set the account balance to the sum of its stored transactions, within the upload's transaction"""
+        # Summed by SQLite over the account_id index rather than added up in Python
+        conn.execute(
+            """UPDATE accounts
+               SET balance = (SELECT TOTAL(amount) FROM transactions WHERE account_id = ?)
+               WHERE id = ?""",
+            (account_id, account_id)
+        )
     
     def get_upload_history(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent upload history"""
         try:
             # Get upload summary by grouping transactions by creation date
-            uploads = execute_query(f"""
+            # LIMIT is bound so the statement text (and its cached plan) is
+            # the same for every call; TOTAL() always yields a REAL
+            uploads = execute_query("""
                 SELECT 
                     a.name as account_name,
                     DATE(t.created_at) as upload_date,
                     COUNT(*) as transaction_count,
-                    SUM(CASE WHEN t.amount > 0 THEN t.amount ELSE 0 END) as total_credits,
-                    SUM(CASE WHEN t.amount < 0 THEN t.amount ELSE 0 END) as total_debits,
+                    TOTAL(CASE WHEN t.amount > 0 THEN t.amount END) as total_credits,
+                    TOTAL(CASE WHEN t.amount < 0 THEN t.amount END) as total_debits,
                     MIN(t.date) as earliest_transaction,
                     MAX(t.date) as latest_transaction
                 FROM transactions t
                 JOIN accounts a ON t.account_id = a.id
                 GROUP BY a.name, DATE(t.created_at)
                 ORDER BY upload_date DESC
-                LIMIT {limit}
-            """)
+                LIMIT ?
+            """, (limit,))
             
             return [
                 {
                     "account_name": upload['account_name'],
                     "upload_date": upload['upload_date'],
                     "transaction_count": upload['transaction_count'],
-                    "total_credits": float(upload['total_credits']),
-                    "total_debits": float(upload['total_debits']),
-                    "net_amount": float(upload['total_credits']) + float(upload['total_debits']),
+                    "total_credits": upload['total_credits'],
+                    "total_debits": upload['total_debits'],
+                    "net_amount": upload['total_credits'] + upload['total_debits'],
                     "date_range": {
                         "earliest": upload['earliest_transaction'],
                         "latest": upload['latest_transaction']
@@ -3,11 +3,50 @@ Month-End Reporting Framework for BannkMint AI SMB Banking OS
 Phase 3A: Executive reporting and month-end packages
 """
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
+from functools import lru_cache
 import calendar
-from collections import defaultdict
-from db import execute_query
+import numpy as np
+import pandas as pd
+from db import execute_query, execute_query_rows, data_version
+
+# Distinct (report period, previous period, data version) aggregates kept
+AGGREGATE_CACHE_SIZE = 24
+
+# SQL condition matching one report period, repeated once per period
+PERIOD_RANGE_CONDITION = "(t.date >= ? AND t.date <= ?)"
+
+# Totals per (period, day, category, sign) in one scan, where sign is 1 for
+# revenue, -1 for expenses and 0 for zero amounts; the period is 'current'
+# from the report start onwards and 'previous' before it. Rows are ordered
+# by first transaction, so days also come out in date order
+PERIOD_TOTALS_QUERY = """
+    SELECT CASE WHEN t.date >= ? THEN 'current' ELSE 'previous' END AS period,
+           substr(t.date, 1, 10) AS day,
+           t.category AS category,
+           CASE WHEN t.amount > 0 THEN 1 WHEN t.amount < 0 THEN -1 ELSE 0 END AS sign,
+           COUNT(*) AS count,
+           SUM(t.amount) AS amount,
+           SUM(COALESCE(t.confidence, 0)) AS confidence_sum,
+           MAX(ABS(t.amount)) AS largest
+    FROM transactions t
+    WHERE {period_ranges}
+    GROUP BY period, day, t.category, sign
+    ORDER BY MIN(t.date), MIN(t.rowid)
+"""
+
+# Column dtypes of the (day, category, sign) totals, in query column order,
+# once they are turned from row tuples into one NumPy array per column
+PERIOD_ROW_DTYPES = {
+    "day": object,
+    "category": object,
+    "sign": np.int8,
+    "count": np.int64,
+    "amount": np.float64,
+    "confidence_sum": np.float64,
+    "largest": np.float64
+}
 
 class ReportingService:
     """Month-end reporting and executive dashboard service"""
@@ -21,6 +60,9 @@ class ReportingService:
             'Equipment & Supplies', 'Banking & Fees', 'Taxes',
             'Payroll & Benefits', 'Loan Payments'
         ]
+        
+        # Aggregates memoized per period and data version; see _get_period_aggregates
+        self._cached_aggregates = lru_cache(maxsize=AGGREGATE_CACHE_SIZE)(self._fetch_period_aggregates)
     
     def generate_month_end_report(
         self, 
@@ -44,25 +86,30 @@ class ReportingService:
         # Previous month for comparison
         prev_start, prev_end = self._get_previous_month_range(year, month)
         
-        # Get transaction data
-        current_transactions = self._get_transactions_for_period(report_start, report_end)
+        # Get per-category and per-day totals for both months in one pass,
+        # aggregated by SQLite
+        compare = include_comparisons and prev_start and prev_end
+        aggregates = self._get_period_aggregates(
+            (report_start, report_end),
+            (prev_start, prev_end) if compare else None
+        )
+        current_aggregates = aggregates["current"]
         
         # Generate report sections
-        income_statement = self._generate_income_statement(current_transactions)
-        cash_flow_statement = self._generate_cash_flow_summary(current_transactions)
-        category_analysis = self._generate_category_analysis(current_transactions)
+        income_statement = self._generate_income_statement(current_aggregates)
+        cash_flow_statement = self._generate_cash_flow_summary(current_aggregates)
+        category_analysis = self._generate_category_analysis(current_aggregates)
         
         # Comparison data if requested
         comparisons = {}
-        if include_comparisons and prev_start and prev_end:
-            prev_transactions = self._get_transactions_for_period(prev_start, prev_end)
+        if compare:
             comparisons = self._generate_period_comparisons(
-                current_transactions, prev_transactions
+                current_aggregates, aggregates["previous"]
             )
         
         # Key metrics and alerts
-        key_metrics = self._calculate_key_metrics(current_transactions)
-        alerts = self._generate_month_end_alerts(current_transactions, key_metrics)
+        key_metrics = self._calculate_key_metrics(current_aggregates)
+        alerts = self._generate_month_end_alerts(current_aggregates, key_metrics)
         
         # Executive summary
         executive_summary = self._generate_executive_summary(
@@ -88,96 +135,172 @@ class ReportingService:
             "report_type": "month_end_package"
         }
     
-    def _get_transactions_for_period(
+    def _get_period_aggregates(
         self, 
-        start_date: datetime, 
-        end_date: datetime
-    ) -> List[Dict[str, Any]]:
-        """Get all transactions for a specific period"""
+        report_range: Tuple[datetime, datetime], 
+        previous_range: Optional[Tuple[datetime, datetime]] = None
+    ) -> Dict[str, Dict[str, Dict[str, np.ndarray]]]:
+        """
+        Get per-(category, sign) and per-day totals for the report period and,
+        optionally, the period before it, from a single query over both.
+        Every aggregate is a dict of NumPy columns; groups come in order of
+        their first transaction, days in date order
+        """
+        # Repeated reports reuse the aggregates until the data changes; the
+        # report sections only read them, so they are shared, not copied
         try:
-            transactions = execute_query(
-                """SELECT t.*, a.name as account_name 
-                   FROM transactions t 
-                   JOIN accounts a ON t.account_id = a.id 
-                   WHERE t.date >= ? AND t.date <= ? 
-                   ORDER BY t.date""",
-                (start_date.isoformat(), end_date.isoformat())
-            )
-            
-            # Convert to proper types
-            for trans in transactions:
-                trans['amount'] = float(trans['amount'])
-                trans['confidence'] = float(trans.get('confidence', 0))
-                
-            return transactions
+            return self._cached_aggregates(report_range, previous_range, data_version())
             
         except Exception as e:
             print(f"Error fetching transactions: {e}")
-            return []
+            return {period: self._fold_period_rows([]) for period in ("current", "previous")}
     
-    def _generate_income_statement(self, transactions: List[Dict]) -> Dict[str, Any]:
-        """Generate income statement from transactions"""
-        revenue_categories = ['Revenue - Sales', 'Revenue - Services', 'Revenue - Other']
+    def _fetch_period_aggregates(
+        self, 
+        report_range: Tuple[datetime, datetime], 
+        previous_range: Optional[Tuple[datetime, datetime]], 
+        data_version: Tuple
+    ) -> Dict[str, Dict[str, Dict[str, np.ndarray]]]:
+        """Run the period totals query; data_version only keys the cache"""
+        ranges = [report_range] if previous_range is None else [report_range, previous_range]
+        period_ranges = " OR ".join([PERIOD_RANGE_CONDITION] * len(ranges))
+        params = (report_range[0].isoformat(),) + tuple(
+            bound.isoformat() for date_range in ranges for bound in date_range
+        )
         
-        # Categorize transactions
-        revenue_items = []
-        expense_items = []
+        rows = {"current": [], "previous": []}
+        for period, *totals in execute_query_rows(PERIOD_TOTALS_QUERY.format(period_ranges=period_ranges), params):
+            rows[period].append(totals)
         
-        for trans in transactions:
-            category = trans.get('category', 'Uncategorized')
-            amount = trans['amount']
-            
-            if amount > 0:  # Revenue
-                revenue_items.append({
-                    "category": category,
-                    "amount": amount,
-                    "transaction_count": 1
-                })
-            else:  # Expense
-                expense_items.append({
-                    "category": category,
-                    "amount": abs(amount),
-                    "transaction_count": 1
-                })
-        
-        # Aggregate by category
-        revenue_by_category = defaultdict(lambda: {"amount": 0, "count": 0})
-        expense_by_category = defaultdict(lambda: {"amount": 0, "count": 0})
-        
-        for item in revenue_items:
-            category = item["category"]
-            revenue_by_category[category]["amount"] += item["amount"]
-            revenue_by_category[category]["count"] += 1
-        
-        for item in expense_items:
-            category = item["category"]
-            expense_by_category[category]["amount"] += item["amount"]
-            expense_by_category[category]["count"] += 1
+        return {period: self._fold_period_rows(period_rows) for period, period_rows in rows.items()}
+    
+    def _fold_period_rows(self, rows: List[List[Any]]) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Fold (day, category, sign) totals into per-(category, sign) groups and
+        per-day flows, keeping first-seen order for both
+        """
+        totals = self._to_columns(rows, PERIOD_ROW_DTYPES)
+        
+        # Groups are keyed by category code and sign, packed into one integer
+        category_codes, _ = self._factorize(totals["category"])
+        group_codes, group_rows = self._factorize(category_codes * 3 + totals["sign"] + 1)
+        group_count = len(group_rows)
+        largest = np.zeros(group_count)
+        np.maximum.at(largest, group_codes, totals["largest"])
+        
+        day_codes, day_rows = self._factorize(totals["day"])
+        day_count = len(day_rows)
+        revenue = totals["sign"] > 0
+        
+        return {
+            "groups": {
+                "category": totals["category"][group_rows],
+                "sign": totals["sign"][group_rows],
+                "count": np.bincount(group_codes, weights=totals["count"], minlength=group_count).astype(np.int64),
+                "amount": np.bincount(group_codes, weights=totals["amount"], minlength=group_count),
+                "confidence_sum": np.bincount(group_codes, weights=totals["confidence_sum"], minlength=group_count),
+                "largest": largest
+            },
+            "days": {
+                "day": totals["day"][day_rows],
+                "inflows": np.bincount(day_codes, weights=np.where(revenue, totals["amount"], 0.0), minlength=day_count),
+                "outflows": np.bincount(day_codes, weights=np.where(revenue, 0.0, -totals["amount"]), minlength=day_count)
+            }
+        }
+    
+    def _factorize(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Code keys in first-seen order (None is a key of its own) and return
+        the codes with the row each code first appears at
+        """
+        codes, _ = pd.factorize(keys, use_na_sentinel=False)
+        return codes, np.unique(codes, return_index=True)[1]
+    
+    def _to_columns(self, rows: List[List[Any]], dtypes: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """Turn aggregate rows, in dtypes order, into one array per column"""
+        columns = zip(*rows) if rows else [()] * len(dtypes)
+        return {
+            name: np.array(column, dtype=dtype)
+            for (name, dtype), column in zip(dtypes.items(), columns)
+        }
+    
+    def _period_totals(self, aggregates: Dict[str, Dict[str, np.ndarray]]) -> Dict[str, Any]:
+        """Revenue, expense and count totals shared by several report sections"""
+        groups = aggregates["groups"]
+        revenue = groups["sign"] > 0
+        expense = groups["sign"] < 0
+        return {
+            "revenue": float(groups["amount"][revenue].sum()),
+            "expenses": abs(float(groups["amount"][expense].sum())),
+            "transaction_count": int(groups["count"].sum()),
+            "revenue_count": int(groups["count"][revenue].sum()),
+            "expense_count": int(groups["count"][expense].sum()),
+            "largest_revenue": float(groups["largest"][revenue].max(initial=0)),
+            "largest_expense": float(groups["largest"][expense].max(initial=0))
+        }
+    
+    def _category_totals(
+        self, 
+        groups: Dict[str, np.ndarray], 
+        mask: Optional[np.ndarray] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Absolute amount, count and confidence totals per category over the
+        selected groups, largest amount first (ties keep first-seen order)
+        """
+        selected = slice(None) if mask is None else mask
+        categories = groups["category"][selected]
+        codes, first_rows = self._factorize(categories)
+        category_count = len(first_rows)
+        totals = {
+            "category": categories[first_rows],
+            "amount": np.bincount(codes, weights=np.abs(groups["amount"][selected]), minlength=category_count),
+            "count": np.bincount(codes, weights=groups["count"][selected], minlength=category_count).astype(np.int64),
+            "confidence_sum": np.bincount(codes, weights=groups["confidence_sum"][selected], minlength=category_count)
+        }
+        order = np.argsort(-totals["amount"], kind='stable')
+        return {name: column[order] for name, column in totals.items()}
+    
+    def _generate_income_statement(self, aggregates: Dict[str, Dict[str, np.ndarray]]) -> Dict[str, Any]:
+        """Generate income statement from period aggregates"""
+        # Aggregate by category; zero amounts count as expenses
+        groups = aggregates["groups"]
+        revenue = groups["sign"] > 0
+        revenue_by_category = self._category_totals(groups, revenue)
+        expense_by_category = self._category_totals(groups, ~revenue)
         
         # Calculate totals
-        total_revenue = sum(cat["amount"] for cat in revenue_by_category.values())
-        total_expenses = sum(cat["amount"] for cat in expense_by_category.values())
+        total_revenue = float(np.abs(groups["amount"][revenue]).sum())
+        total_expenses = float(np.abs(groups["amount"][~revenue]).sum())
         net_income = total_revenue - total_expenses
         
         # Format for output
         revenue_breakdown = [
             {
                 "category": cat,
-                "amount": data["amount"],
-                "transaction_count": data["count"],
-                "percentage_of_revenue": (data["amount"] / total_revenue * 100) if total_revenue > 0 else 0
+                "amount": amount,
+                "transaction_count": count,
+                "percentage_of_revenue": (amount / total_revenue * 100) if total_revenue > 0 else 0
             }
-            for cat, data in sorted(revenue_by_category.items(), key=lambda x: x[1]["amount"], reverse=True)
+            for cat, amount, count in zip(
+                revenue_by_category["category"],
+                revenue_by_category["amount"].tolist(),
+                revenue_by_category["count"].tolist()
+            )
         ]
         
         expense_breakdown = [
             {
                 "category": cat,
-                "amount": data["amount"],
-                "transaction_count": data["count"],
-                "percentage_of_expenses": (data["amount"] / total_expenses * 100) if total_expenses > 0 else 0
+                "amount": amount,
+                "transaction_count": count,
+                "percentage_of_expenses": (amount / total_expenses * 100) if total_expenses > 0 else 0
             }
-            for cat, data in sorted(expense_by_category.items(), key=lambda x: x[1]["amount"], reverse=True)
+            for cat, amount, count in zip(
+                expense_by_category["category"],
+                expense_by_category["amount"].tolist(),
+                expense_by_category["count"].tolist()
+            )
         ]
         
         return {
@@ -189,32 +312,35 @@ class ReportingService:
             "expense_breakdown": expense_breakdown
         }
     
-    def _generate_cash_flow_summary(self, transactions: List[Dict]) -> Dict[str, Any]:
+    def _generate_cash_flow_summary(self, aggregates: Dict[str, Dict[str, np.ndarray]]) -> Dict[str, Any]:
         """Generate cash flow summary"""
-        total_inflows = sum(trans['amount'] for trans in transactions if trans['amount'] > 0)
-        total_outflows = abs(sum(trans['amount'] for trans in transactions if trans['amount'] < 0))
+        totals = self._period_totals(aggregates)
+        total_inflows = totals["revenue"]
+        total_outflows = totals["expenses"]
         net_cash_flow = total_inflows - total_outflows
         
         # Daily cash flow analysis
-        daily_flows = defaultdict(lambda: {"inflows": 0, "outflows": 0})
-        
-        for trans in transactions:
-            date_key = trans['date'][:10]  # Extract date part
-            amount = trans['amount']
-            
-            if amount > 0:
-                daily_flows[date_key]["inflows"] += amount
-            else:
-                daily_flows[date_key]["outflows"] += abs(amount)
+        daily_flows = aggregates["days"]
         
         # Calculate average daily flows
-        days_with_activity = len(daily_flows)
+        days_with_activity = len(daily_flows["day"])
         avg_daily_inflow = total_inflows / days_with_activity if days_with_activity > 0 else 0
         avg_daily_outflow = total_outflows / days_with_activity if days_with_activity > 0 else 0
         
-        # Find peak days
-        max_inflow_day = max(daily_flows.items(), key=lambda x: x[1]["inflows"], default=(None, {"inflows": 0}))
-        max_outflow_day = max(daily_flows.items(), key=lambda x: x[1]["outflows"], default=(None, {"outflows": 0}))
+        # Find peak days (argmax keeps the earliest day on ties)
+        peak_inflow = {"date": None, "amount": 0}
+        peak_outflow = {"date": None, "amount": 0}
+        if days_with_activity:
+            inflow_index = int(np.argmax(daily_flows["inflows"]))
+            outflow_index = int(np.argmax(daily_flows["outflows"]))
+            peak_inflow = {
+                "date": daily_flows["day"][inflow_index],
+                "amount": float(daily_flows["inflows"][inflow_index])
+            }
+            peak_outflow = {
+                "date": daily_flows["day"][outflow_index],
+                "amount": float(daily_flows["outflows"][outflow_index])
+            }
         
         return {
             "total_cash_inflows": total_inflows,
@@ -223,57 +349,41 @@ class ReportingService:
             "average_daily_inflow": avg_daily_inflow,
             "average_daily_outflow": avg_daily_outflow,
             "days_with_activity": days_with_activity,
-            "peak_inflow_day": {
-                "date": max_inflow_day[0],
-                "amount": max_inflow_day[1]["inflows"]
-            },
-            "peak_outflow_day": {
-                "date": max_outflow_day[0],
-                "amount": max_outflow_day[1]["outflows"]
-            }
+            "peak_inflow_day": peak_inflow,
+            "peak_outflow_day": peak_outflow
         }
     
-    def _generate_category_analysis(self, transactions: List[Dict]) -> Dict[str, Any]:
+    def _generate_category_analysis(self, aggregates: Dict[str, Dict[str, np.ndarray]]) -> Dict[str, Any]:
         """Detailed category analysis"""
-        category_stats = defaultdict(lambda: {
-            "total_amount": 0,
-            "transaction_count": 0,
-            "avg_transaction_size": 0,
-            "confidence_scores": []
-        })
-        
-        for trans in transactions:
-            category = trans.get('category', 'Uncategorized')
-            amount = abs(trans['amount'])  # Use absolute value for analysis
-            confidence = trans.get('confidence', 0)
-            
-            category_stats[category]["total_amount"] += amount
-            category_stats[category]["transaction_count"] += 1
-            category_stats[category]["confidence_scores"].append(confidence)
+        # Use absolute values for analysis
+        category_stats = self._category_totals(aggregates["groups"])
         
         # Calculate averages and format output
         category_analysis = []
-        total_volume = sum(stats["total_amount"] for stats in category_stats.values())
-        
-        for category, stats in category_stats.items():
-            avg_confidence = (
-                sum(stats["confidence_scores"]) / len(stats["confidence_scores"])
-                if stats["confidence_scores"] else 0
-            )
+        total_volume = float(np.abs(aggregates["groups"]["amount"]).sum())
+        
+        for category, amount, count, confidence_sum in zip(
+            category_stats["category"],
+            category_stats["amount"].tolist(),
+            category_stats["count"].tolist(),
+            category_stats["confidence_sum"].tolist()
+        ):
+            avg_confidence = confidence_sum / count
+            # Thresholds compare a rounded average so float accumulation noise
+            # can't decide the quality band: an average that is exactly 0.8 up
+            # to rounding (e.g. every row scored 0.8) is "medium", never "high"
+            quality_score = round(avg_confidence, 9)
             
             category_analysis.append({
                 "category": category,
-                "total_amount": stats["total_amount"],
-                "transaction_count": stats["transaction_count"],
-                "average_transaction_size": stats["total_amount"] / stats["transaction_count"],
-                "percentage_of_total": (stats["total_amount"] / total_volume * 100) if total_volume > 0 else 0,
+                "total_amount": amount,
+                "transaction_count": count,
+                "average_transaction_size": amount / count,
+                "percentage_of_total": (amount / total_volume * 100) if total_volume > 0 else 0,
                 "average_confidence": avg_confidence,
-                "data_quality": "high" if avg_confidence > 0.8 else "medium" if avg_confidence > 0.5 else "low"
+                "data_quality": "high" if quality_score > 0.8 else "medium" if quality_score > 0.5 else "low"
             })
         
-        # Sort by total amount
-        category_analysis.sort(key=lambda x: x["total_amount"], reverse=True)
-        
         return {
             "categories": category_analysis,
             "total_categories": len(category_analysis),
@@ -283,31 +393,23 @@ class ReportingService:
             )
         }
     
-    def _calculate_key_metrics(self, transactions: List[Dict]) -> Dict[str, Any]:
+    def _calculate_key_metrics(self, aggregates: Dict[str, Dict[str, np.ndarray]]) -> Dict[str, Any]:
         """Calculate key financial metrics"""
-        if not transactions:
+        if not len(aggregates["groups"]["count"]):
             return {}
         
         # Basic calculations
-        total_revenue = sum(trans['amount'] for trans in transactions if trans['amount'] > 0)
-        total_expenses = abs(sum(trans['amount'] for trans in transactions if trans['amount'] < 0))
-        transaction_count = len(transactions)
+        totals = self._period_totals(aggregates)
+        total_revenue = totals["revenue"]
+        total_expenses = totals["expenses"]
+        transaction_count = totals["transaction_count"]
         
         # Average transaction sizes
-        revenue_transactions = [trans['amount'] for trans in transactions if trans['amount'] > 0]
-        expense_transactions = [abs(trans['amount']) for trans in transactions if trans['amount'] < 0]
-        
-        avg_revenue_per_transaction = sum(revenue_transactions) / len(revenue_transactions) if revenue_transactions else 0
-        avg_expense_per_transaction = sum(expense_transactions) / len(expense_transactions) if expense_transactions else 0
+        avg_revenue_per_transaction = total_revenue / totals["revenue_count"] if totals["revenue_count"] else 0
+        avg_expense_per_transaction = total_expenses / totals["expense_count"] if totals["expense_count"] else 0
         
         # Daily metrics
-        date_range = []
-        for trans in transactions:
-            date_str = trans['date'][:10]
-            if date_str not in date_range:
-                date_range.append(date_str)
-        
-        active_days = len(date_range)
+        active_days = len(aggregates["days"]["day"])
         avg_daily_transactions = transaction_count / active_days if active_days > 0 else 0
         
         # Cash efficiency metrics
@@ -320,8 +422,8 @@ class ReportingService:
             "average_expense_per_transaction": avg_expense_per_transaction,
             "active_business_days": active_days,
             "average_daily_transactions": avg_daily_transactions,
-            "largest_single_revenue": max(revenue_transactions) if revenue_transactions else 0,
-            "largest_single_expense": max(expense_transactions) if expense_transactions else 0
+            "largest_single_revenue": totals["largest_revenue"],
+            "largest_single_expense": totals["largest_expense"]
         }
     
     def _get_previous_month_range(self, year: int, month: int) -> tuple:
@@ -341,18 +443,20 @@ class ReportingService:
     
     def _generate_period_comparisons(
         self, 
-        current_transactions: List[Dict], 
-        previous_transactions: List[Dict]
+        current_aggregates: Dict[str, Dict[str, np.ndarray]], 
+        previous_aggregates: Dict[str, Dict[str, np.ndarray]]
     ) -> Dict[str, Any]:
         """Generate month-over-month comparisons"""
         # Current period metrics
-        current_revenue = sum(t['amount'] for t in current_transactions if t['amount'] > 0)
-        current_expenses = abs(sum(t['amount'] for t in current_transactions if t['amount'] < 0))
+        current = self._period_totals(current_aggregates)
+        current_revenue = current["revenue"]
+        current_expenses = current["expenses"]
         current_net = current_revenue - current_expenses
         
         # Previous period metrics
-        prev_revenue = sum(t['amount'] for t in previous_transactions if t['amount'] > 0)
-        prev_expenses = abs(sum(t['amount'] for t in previous_transactions if t['amount'] < 0))
+        previous = self._period_totals(previous_aggregates)
+        prev_revenue = previous["revenue"]
+        prev_expenses = previous["expenses"]
         prev_net = prev_revenue - prev_expenses
         
         # Calculate changes
@@ -375,21 +479,23 @@ class ReportingService:
                 "percentage_change": calculate_change(current_net, prev_net)
             },
             "transaction_count_change": {
-                "amount_change": len(current_transactions) - len(previous_transactions),
-                "percentage_change": calculate_change(len(current_transactions), len(previous_transactions))
+                "amount_change": current["transaction_count"] - previous["transaction_count"],
+                "percentage_change": calculate_change(current["transaction_count"], previous["transaction_count"])
             }
         }
     
     def _generate_month_end_alerts(
         self, 
-        transactions: List[Dict], 
+        aggregates: Dict[str, Dict[str, np.ndarray]], 
         metrics: Dict[str, Any]
     ) -> List[Dict[str, str]]:
         """Generate month-end alerts and insights"""
         alerts = []
+        totals = self._period_totals(aggregates)
+        transaction_count = totals["transaction_count"]
         
         # Revenue analysis
-        total_revenue = sum(trans['amount'] for trans in transactions if trans['amount'] > 0)
+        total_revenue = totals["revenue"]
         if total_revenue < 10000:
             alerts.append({
                 "type": "revenue",
@@ -399,7 +505,7 @@ class ReportingService:
             })
         
         # Expense analysis
-        total_expenses = abs(sum(trans['amount'] for trans in transactions if trans['amount'] < 0))
+        total_expenses = totals["expenses"]
         if total_expenses > total_revenue * 1.2:  # Expenses > 120% of revenue
             alerts.append({
                 "type": "expenses",
@@ -409,8 +515,10 @@ class ReportingService:
             })
         
         # Data quality analysis
-        uncategorized_count = len([t for t in transactions if not t.get('category') or t.get('category') == 'Uncategorized'])
-        if uncategorized_count > len(transactions) * 0.2:  # >20% uncategorized
+        categories = aggregates["groups"]["category"]
+        uncategorized = np.equal(categories, None) | (categories == '') | (categories == 'Uncategorized')
+        uncategorized_count = int(aggregates["groups"]["count"][uncategorized].sum())
+        if uncategorized_count > transaction_count * 0.2:  # >20% uncategorized
             alerts.append({
                 "type": "data_quality",
                 "severity": "low",
@@ -419,12 +527,12 @@ class ReportingService:
             })
         
         # Transaction volume analysis
-        if len(transactions) < 20:  # Very few transactions
+        if transaction_count < 20:  # Very few transactions
             alerts.append({
                 "type": "activity",
                 "severity": "medium",
                 "title": "Low Transaction Volume",
-                "message": f"Only {len(transactions)} transactions this month - consider business activity review"
+                "message": f"Only {transaction_count} transactions this month - consider business activity review"
             })
         
         return alerts
@@ -0,0 +1,153 @@
+"""
+Schema migration tests: databases written by the original schema are
+upgraded in place by db.init_database()
+"""
+import queue
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+import db
+
+# Tables as the first release created them: no transaction_hash column,
+# no unique account names and rowid tables throughout
+BASELINE_SCHEMA = """
+    CREATE TABLE accounts (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        account_type TEXT NOT NULL,
+        balance REAL NOT NULL DEFAULT 0.0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE transactions (
+        id TEXT PRIMARY KEY,
+        account_id TEXT NOT NULL,
+        date TIMESTAMP NOT NULL,
+        description TEXT NOT NULL,
+        amount REAL NOT NULL,
+        category TEXT,
+        confidence REAL DEFAULT 0.0,
+        explanation TEXT,
+        original_csv_row INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (account_id) REFERENCES accounts (id)
+    );
+    CREATE TABLE rules (
+        id TEXT PRIMARY KEY,
+        description_pattern TEXT NOT NULL,
+        category TEXT NOT NULL,
+        confidence REAL NOT NULL DEFAULT 1.0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE corrections (
+        id TEXT PRIMARY KEY,
+        transaction_id TEXT NOT NULL,
+        old_category TEXT NOT NULL,
+        new_category TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (transaction_id) REFERENCES transactions (id)
+    );
+"""
+
+@pytest.fixture
+def baseline_db(tmp_path, monkeypatch):
+    """A baseline-schema database that db.py is pointed at, not yet migrated"""
+    path = tmp_path / "transactions.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    
+    pool = queue.Queue(maxsize=db.POOL_SIZE)
+    monkeypatch.setattr(db, "DATABASE_PATH", str(path))
+    monkeypatch.setattr(db, "_pool", pool)
+    monkeypatch.setattr(db, "_schema_ready", False)
+    yield conn
+    
+    conn.close()
+    while not pool.empty():
+        pool.get_nowait().close()
+
+def add_account(conn, account_id, name, balance, created_at):
+    conn.execute(
+        "INSERT INTO accounts (id, name, account_type, balance, created_at) VALUES (?, ?, 'checking', ?, ?)",
+        (account_id, name, balance, created_at)
+    )
+
+def add_transaction(conn, transaction_id, account_id, date, description, amount):
+    conn.execute(
+        "INSERT INTO transactions (id, account_id, date, description, amount) VALUES (?, ?, ?, ?, ?)",
+        (transaction_id, account_id, date, description, amount)
+    )
+
+def stored_hashes(conn):
+    return dict(conn.execute("SELECT id, transaction_hash FROM transactions"))
+
+def test_duplicate_rows_keep_hash_on_earliest_copy(baseline_db):
+    add_account(baseline_db, "acct", "Main", 0.0, "2026-01-01 00:00:00")
+    add_transaction(baseline_db, "t1", "acct", "2026-01-05T00:00:00", "STRIPE PAYOUT", 120.0)
+    add_transaction(baseline_db, "t2", "acct", "2026-01-05T09:30:00", "STRIPE PAYOUT", 120.0)
+    add_transaction(baseline_db, "t3", "acct", "2026-01-05T00:00:00", "STRIPE PAYOUT", 120.0)
+    add_transaction(baseline_db, "t4", "acct", "2026-01-06T00:00:00", "RENT PAYMENT", -900.0)
+    baseline_db.commit()
+    
+    db.init_database()
+    
+    hashes = stored_hashes(baseline_db)
+    assert hashes["t1"] == db.transaction_hash("2026-01-05", "STRIPE PAYOUT", 120.0)
+    assert hashes["t2"] is None
+    assert hashes["t3"] is None
+    assert hashes["t4"] == db.transaction_hash("2026-01-06", "RENT PAYMENT", -900.0)
+    assert baseline_db.execute("PRAGMA user_version").fetchone()[0] == db.TRANSACTION_HASH_VERSION
+
+def test_duplicate_account_names_are_merged(baseline_db):
+    add_account(baseline_db, "first", "Main", 100.0, "2026-01-01 00:00:00")
+    add_account(baseline_db, "second", "Main", 50.0, "2026-02-01 00:00:00")
+    add_account(baseline_db, "other", "Savings", 10.0, "2026-01-15 00:00:00")
+    add_transaction(baseline_db, "t1", "first", "2026-01-05T00:00:00", "STRIPE PAYOUT", 120.0)
+    add_transaction(baseline_db, "t2", "second", "2026-01-05T00:00:00", "STRIPE PAYOUT", 120.0)
+    add_transaction(baseline_db, "t3", "second", "2026-02-03T00:00:00", "GOOGLE ADS", -75.5)
+    add_transaction(baseline_db, "t4", "other", "2026-01-20T00:00:00", "INTEREST", 0.25)
+    baseline_db.commit()
+    
+    db.init_database()
+    
+    accounts = dict(baseline_db.execute("SELECT id, balance FROM accounts"))
+    assert accounts == {"first": 150.0, "other": 10.0}
+    
+    owners = dict(baseline_db.execute("SELECT id, account_id FROM transactions"))
+    assert owners == {"t1": "first", "t2": "first", "t3": "first", "t4": "other"}
+    
+    # The moved copy of t1 gives up its hash to stay under the unique index
+    hashes = stored_hashes(baseline_db)
+    assert hashes["t1"] is not None
+    assert hashes["t2"] is None
+    assert hashes["t3"] == db.transaction_hash("2026-02-03", "GOOGLE ADS", -75.5)
+
+def test_reupload_after_migration_reports_every_row_as_duplicate(baseline_db):
+    rows = [
+        ("2026-01-05", "STRIPE PAYOUT", 120.0),
+        ("2026-01-06", "RENT PAYMENT", -900.0),
+        ("2026-01-07", "AMAZON WEB SERVICES", -42.17),
+        ("2026-01-08", "ACME CONSULTING", 2500.0),
+    ]
+    add_account(baseline_db, "acct", "Main", 0.0, "2026-01-01 00:00:00")
+    for i, (day, description, amount) in enumerate(rows):
+        add_transaction(baseline_db, f"t{i}", "acct", f"{day}T00:00:00", description, amount)
+    baseline_db.commit()
+    
+    # Imported only now: the categorization singleton reads the database
+    from services.ingest import ingestion_service
+    
+    # Whole-number amounts are written without decimals, as bank exports do
+    csv = "Date,Description,Amount\n" + "\n".join(
+        f"{day},{description},{amount:g}" for day, description, amount in rows
+    )
+    result = ingestion_service.process_csv_upload(csv, "Main")
+    
+    assert result["success"]
+    assert result["duplicate_count"] == len(rows)
+    assert result["processed_count"] == 0
+    assert baseline_db.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == len(rows)